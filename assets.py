@@ -0,0 +1,172 @@
+"""Remote assets (logos, icons, fonts, music) resolved to files in a local on-disk cache.
+
+The apps pull their branding and music from URLs. Each URL is downloaded
+once per machine into ``CACHE_ROOT/assets`` and then served from disk. After
+``ADGEN_ASSET_TTL`` seconds the copy is revalidated with a conditional GET
+(``If-None-Match`` / ``If-Modified-Since``), so an unchanged asset costs one
+304 and not a download. When the network fails, a stale copy is still used.
+Set ``ADGEN_OFFLINE=1`` to never touch the network: only assets that are
+already cached are available.
+
+Renderers get decoded objects: :func:`image` and :func:`font` decode each
+file once per process and re-decode only when revalidation replaced it.
+:func:`preload` fetches an app's assets in a background thread as soon as
+it starts, so the first render does not wait on the network.
+"""
+import collections
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageFont
+
+from disk_cache import CACHE_ROOT, digest
+
+ASSET_DIR = os.path.join(CACHE_ROOT, "assets")
+TTL = int(os.environ.get("ADGEN_ASSET_TTL", str(24 * 3600)))   # seconds before a cached copy is revalidated
+TIMEOUT = float(os.environ.get("ADGEN_ASSET_TIMEOUT", "15"))
+OFFLINE = os.environ.get("ADGEN_OFFLINE", "") not in ("", "0")
+RETRY_AFTER = 60   # seconds before a failed download of an uncached asset is tried again
+
+_locks = collections.defaultdict(threading.Lock)   # one download of a URL at a time
+_locks_guard = threading.Lock()
+_failed = {}       # url -> time of the last failed download, so callers in a frame loop fail fast
+_preloaded = set()
+
+
+class AssetUnavailable(OSError):
+    """The asset is not cached and could not be downloaded."""
+
+
+def _paths(url):
+    """The cached file for ``url`` (keeping its extension, for tools that sniff it) and its metadata file."""
+    base = os.path.join(ASSET_DIR, digest("asset", url))
+    return base + os.path.splitext(urlsplit(url).path)[1].lower(), base + ".json"
+
+
+def _write(path, data):
+    """Write ``data`` to ``path`` atomically, so readers and other processes never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _download(url, data_path, meta):
+    """Fetch ``url`` into ``data_path``, conditionally when ``meta`` has validators; returns the new metadata."""
+    import requests
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    resp = requests.get(url, headers=headers, timeout=TIMEOUT)
+    if resp.status_code == 304 and meta:
+        return dict(meta, checked=time.time())
+    resp.raise_for_status()
+    _write(data_path, resp.content)
+    return {"url": url, "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "size": len(resp.content), "checked": time.time()}
+
+
+def path(url, ttl=None, offline=None):
+    """Local path of the cached copy of ``url``, downloading or revalidating it first when needed.
+
+    Raises :class:`AssetUnavailable` when there is no cached copy and it
+    cannot be fetched (or ``offline``, which defaults to ``ADGEN_OFFLINE``).
+    """
+    ttl = TTL if ttl is None else ttl
+    offline = OFFLINE if offline is None else offline
+    data_path, meta_path = _paths(url)
+    with _locks_guard:
+        lock = _locks[url]
+    with lock:
+        meta = _read_meta(meta_path) if os.path.exists(data_path) else None
+        if meta is not None and (offline or time.time() - meta.get("checked", 0) < ttl):
+            return data_path
+        if offline:
+            raise AssetUnavailable(f"{url} is not cached (offline mode)")
+        if meta is None and time.time() - _failed.get(url, -RETRY_AFTER) < RETRY_AFTER:
+            raise AssetUnavailable(f"{url} is not cached and its last download failed")
+        try:
+            meta = _download(url, data_path, meta)
+        except Exception as e:
+            _failed[url] = time.time()
+            if meta is not None:
+                return data_path   # a stale copy beats no asset
+            raise AssetUnavailable(f"could not download {url}: {e}") from e
+        _failed.pop(url, None)
+        _write(meta_path, json.dumps(meta).encode())
+        return data_path
+
+
+def read(url, **kwargs):
+    """The bytes of ``url``'s cached copy."""
+    with open(path(url, **kwargs), "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=32)
+def _decode_image(file_path, mtime):
+    img = Image.open(file_path).convert("RGBA")
+    img.load()
+    return img
+
+
+@functools.lru_cache(maxsize=64)
+def _decode_font(file_path, mtime, size):
+    return ImageFont.truetype(file_path, size)
+
+
+def image(url, **kwargs):
+    """``url`` decoded as an RGBA image. Shared between callers: copy it before drawing on it."""
+    file_path = path(url, **kwargs)
+    return _decode_image(file_path, os.path.getmtime(file_path))
+
+
+def font(url, size, **kwargs):
+    """The TrueType font at ``url``, at ``size``."""
+    file_path = path(url, **kwargs)
+    return _decode_font(file_path, os.path.getmtime(file_path), size)
+
+
+def preload(urls, background=True):
+    """Fetch ``urls`` into the cache, once per process; in a daemon thread if ``background``.
+
+    Failures are ignored here: they surface when the asset is actually used.
+    """
+    with _locks_guard:
+        todo = [url for url in urls if url not in _preloaded]
+        _preloaded.update(todo)
+
+    def fetch():
+        for url in todo:
+            try:
+                path(url)
+            except Exception:
+                pass
+
+    if not todo:
+        return
+    if background:
+        threading.Thread(target=fetch, name="asset-preload", daemon=True).start()
+    else:
+        fetch()
@@ -0,0 +1,236 @@
+"""Headless frame-renderer benchmarks with golden-frame checks.
+
+    python bench.py                     # time every case, check frames against bench_golden.json
+    python bench.py --only smart,claude --repeat 5 --out results.json
+    python bench.py --update-golden     # re-record the golden checksums after an intended change
+
+Each app module is loaded without its Streamlit UI by
+:func:`headless.load_app`: only its imports, functions, classes and
+upper-case constants run. Every case renders a fixed set of representative
+``t`` values: once cold, ``repeat`` times warm for ms/frame, and once under
+tracemalloc for peak memory. The
+SHA-256 of every frame is compared with the golden file, so an
+optimization can show that it did not change a pixel. Checksums depend on
+the installed fonts and Pillow version; record them on the machine that
+checks them.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw
+
+import headless
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(ROOT, "bench_golden.json")
+
+PRODUCT_TIMES = [0.0, 0.2, 0.5, 1.0, 1.5, 2.5, 4.0, 5.5]
+TIP_TIMES = [0.0, 0.5, 1.0, 2.0, 3.6, 4.0, 4.5, 5.5]
+LONG_TIMES = [0.0, 0.5, 1.0, 2.0, 3.5, 5.0, 9.0, 12.0, 14.5]
+
+TEXTS = {
+    "caption": "Redefine Your Living Space",
+    "hook": "This Console Changes Everything",
+    "price": "Ksh 49,900",
+    "contact": "0710 895 737",
+    "full_tips": ("EXPERT INSIGHT\n* Prioritize safety features.\n"
+                  "* Less is more; choose high-quality pieces.\n* Select non-toxic, low-VOC finishes."),
+    "tip_title": "Varnish Like a Pro",
+    "tip": "Sand the surface lightly before applying a thin coat of varnish for a smooth, even finish.",
+}
+
+
+def load_app(name):
+    """Namespace of ``<name>.py`` with its imports, functions, classes and constants, but no UI."""
+    return headless.load_app(os.path.join(ROOT, f"{name}.py"))
+
+
+# --- Fixtures: deterministic stand-ins for uploads and downloaded assets ---
+
+@functools.lru_cache(maxsize=None)
+def product_image():
+    img = Image.new("RGBA", (800, 640), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle([80, 120, 720, 520], radius=40, fill=(150, 100, 60, 255))
+    draw.rectangle([120, 520, 160, 620], fill=(90, 60, 40, 255))
+    draw.rectangle([640, 520, 680, 620], fill=(90, 60, 40, 255))
+    for i in range(4):
+        draw.rectangle([120 + i * 150, 180, 240 + i * 150, 460], outline=(210, 165, 68, 255), width=6)
+    return img
+
+
+@functools.lru_cache(maxsize=None)
+def logo_image():
+    img = Image.new("RGBA", (280, 140), (0, 0, 0, 0))
+    ImageDraw.Draw(img).ellipse([10, 10, 270, 130], fill=(212, 175, 55, 220))
+    return img
+
+
+# --- Cases: (case id, params, representative times, render(t) factory) ---
+
+def smart_cases():
+    app = load_app("smart")
+    sprite = app["ProductSprite"](product_image())
+    boxes = [{"x": 50, "y": 50, "w": 200, "h": 100, "role": "logo"},
+             {"x": 60, "y": 250, "w": 600, "h": 600, "role": "product"},
+             {"x": 50, "y": 200, "w": 620, "h": 120, "role": "caption"},
+             {"x": 160, "y": 1050, "w": 400, "h": 120, "role": "price"},
+             {"x": 60, "y": 1200, "w": 600, "h": 60, "role": "contact"}]
+    styles = ["Smooth Fade (All at Once)", "Typewriter (Sequential Reveal)", "Block Reveal (Sequential Block Fade)"]
+    for tpl in app["TEMPLATES"]:
+        # "Product" and "Content" are what the app passes; the long names reach the caption, price and tip layers
+        variants = ([("Product", "Simple Fade", PRODUCT_TIMES), ("Content", styles[0], TIP_TIMES),
+                     ("Product Showcase", "Simple Fade", PRODUCT_TIMES)] + [("Content Video", s, TIP_TIMES) for s in styles])
+        for content_type, style, times in variants:
+            def make(tpl=tpl, content_type=content_type, style=style):
+                scene = app["build_scene"](sprite, boxes, TEXTS, tpl, logo_image(), content_type, style, 6)
+                return lambda t: app["create_frame"](t, scene)
+            yield f"smart/{tpl}/{content_type}/{style}", times, make
+
+
+def claude_cases():
+    app = load_app("claude")
+    sprite = app["ProductSprite"](product_image())
+    for tpl in app["TEMPLATES"]:
+        yield (f"claude/{tpl}", LONG_TIMES,
+               lambda tpl=tpl: lambda t: app["create_tiktok_frame"](t, sprite, tpl, TEXTS))
+
+
+def deepseek_cases():
+    app = load_app("deepseek")
+    lines = app["split_text_into_lines"](TEXTS["tip"])
+    for tpl in ["Modern Minimal", "Luxury Gold", "Geometric Art"]:
+        yield (f"deepseek/{tpl}", TIP_TIMES,
+               lambda tpl=tpl: lambda t: app["create_text_frame"](t, lines, TEXTS["tip_title"], 2, 5, tpl, logo_image()))
+
+
+def simple_factory_cases():
+    app = load_app("simple_factory")
+    width = app["WIDTH"]
+    for tpl in app["TEMPLATE_ANIMATIONS"]:
+        def make(tpl=tpl):
+            font_title = app["adjust_title_font"](TEXTS["tip_title"], width - 200)
+            font_text = app["get_font"](64)
+            lines = app["split_text_dynamic"](TEXTS["tip"], font_text, width - 220)
+            return lambda t: app["create_tiktok_frame"](t, lines, TEXTS["tip_title"], logo_image(), font_title, font_text, tpl)
+        yield f"simple_factory/{tpl}", TIP_TIMES, make
+        yield (f"simple_factory/{tpl}/background", TIP_TIMES,
+               lambda tpl=tpl: lambda t: app["create_background"](tpl, t))
+
+
+def diy_cases():
+    app = load_app("diy")
+
+    def make():
+        size, lines, _ = app["calculate_text_fit"](TEXTS["tip"])
+        return lambda t: app["generate_design"](TEXTS["tip"], size, lines)
+    yield "diy/generate_design", [0.0], make
+
+
+SUITES = {
+    "smart": smart_cases,
+    "claude": claude_cases,
+    "deepseek": deepseek_cases,
+    "simple_factory": simple_factory_cases,
+    "diy": diy_cases,
+}
+
+
+def checksum(frame):
+    arr = np.ascontiguousarray(np.asarray(frame))
+    return hashlib.sha256(repr((arr.shape, arr.dtype.str)).encode() + arr.tobytes()).hexdigest()
+
+
+def run_case(make, times, repeat):
+    """Cold and warm ms/frame, peak traced MB and per-t checksums for one case."""
+    t0 = time.perf_counter()
+    render = make()
+    frames = [render(t) for t in times]
+    cold = (time.perf_counter() - t0) * 1e3 / len(times)
+    sums = {f"{t:g}": checksum(f) for t, f in zip(times, frames)}
+    del frames
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in times:
+            render(t)
+    warm = (time.perf_counter() - t0) * 1e3 / (repeat * len(times))
+
+    tracemalloc.start()
+    try:
+        for t in times:
+            render(t)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"cold_ms_per_frame": round(cold, 2), "ms_per_frame": round(warm, 2),
+            "peak_mb": round(peak / 2 ** 20, 1), "checksums": sums}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", help=f"comma-separated suites ({', '.join(SUITES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="warm passes over the times per case")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results path")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="golden checksum file")
+    parser.add_argument("--update-golden", action="store_true", help="record this run's checksums as golden")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("RENDER_WORKERS", "1")
+    suites = args.only.split(",") if args.only else list(SUITES)
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    results, mismatches = [], []
+    for suite in suites:
+        for case, times, make in SUITES[suite]():
+            result = run_case(make, times, args.repeat)
+            expected = golden.get(case)
+            if args.update_golden or expected is None:
+                result["golden"] = "recorded" if args.update_golden else "missing"
+            else:
+                bad = [t for t, s in result["checksums"].items() if expected.get(t) != s]
+                result["golden"] = "ok" if not bad else "mismatch"
+                if bad:
+                    result["mismatched_times"] = bad
+                    mismatches.append(case)
+            results.append({"case": case, "frames": len(times), **result})
+            print(f"{case:<75} {result['ms_per_frame']:>8.1f} ms/frame  (cold {result['cold_ms_per_frame']:.1f})"
+                  f"  {result['peak_mb']:>6.1f} MB  {result['golden']}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if args.update_golden:
+        golden.update({r["case"]: r["checksums"] for r in results})
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+    if mismatches:
+        print(f"{len(mismatches)} case(s) differ from the golden frames: {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
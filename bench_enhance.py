@@ -0,0 +1,97 @@
+"""Fused enhancement check: output and speed of :func:`enhance.enhance` against the ImageEnhance chain.
+
+    python bench_enhance.py                        # synthetic 12 MP cut-out
+    python bench_enhance.py photos/*.png --repeat 5 --min-psnr 50
+
+For each photo and each app's settings (smart.py and claude.py), the PIL
+``ImageEnhance`` chain the apps used to run and the fused pass are timed and
+compared: PSNR over the colour channels, the largest channel difference, and
+whether alpha is unchanged. Exits 1 when any PSNR is below ``--min-psnr``
+or alpha differs.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+import enhance
+
+SETTINGS = {
+    "smart": {"contrast": 1.15, "sharpness": 1.5},
+    "claude": {"contrast": 1.2, "sharpness": 1.8, "color": 1.15},
+}
+PASSES = (("contrast", ImageEnhance.Contrast), ("sharpness", ImageEnhance.Sharpness), ("color", ImageEnhance.Color))
+
+
+def pil_chain(image, **settings):
+    """What the apps ran before: one full-image ImageEnhance pass per setting."""
+    for name, enhancer in PASSES:
+        if name in settings:
+            image = enhancer(image).enhance(settings[name])
+    return image
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return math.inf if mse == 0 else 10 * math.log10(255.0 ** 2 / mse)
+
+
+def synthetic_cutout(width=4000, height=3000, seed=0):
+    """A 12 MP stand-in for a product cut-out: smooth shading, texture noise and a soft-edged alpha."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    shade = 128 + 80 * np.sin(x / 300) * np.cos(y / 200)
+    rgb = np.stack([shade, shade * 0.8 + 30, shade * 0.6 + 50], axis=-1) + rng.normal(0, 12, (height, width, 3))
+    r = np.hypot((x - width / 2) / (width * 0.4), (y - height / 2) / (height * 0.4))
+    alpha = np.clip((1.0 - r) * 40, 0, 1) * 255
+    return Image.fromarray(np.dstack([np.clip(rgb, 0, 255), alpha]).astype(np.uint8), "RGBA")
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("images", nargs="*", help="RGBA cut-outs (a synthetic 12 MP one when omitted)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (the best is reported)")
+    parser.add_argument("--min-psnr", type=float, default=50.0, help="fail below this PSNR (dB)")
+    parser.add_argument("--out", default="enhance_results.json", help="JSON results path")
+    args = parser.parse_args(argv)
+
+    images = [(path, Image.open(path).convert("RGBA")) for path in args.images] or [("synthetic", synthetic_cutout())]
+    results, failed = [], False
+    for name, image in images:
+        for app, settings in SETTINGS.items():
+            ref, pil_s = best_of(lambda: pil_chain(image, **settings), args.repeat)
+            got, fused_s = best_of(lambda: enhance.enhance(image, **settings), args.repeat)
+            ref, got = np.asarray(ref), np.asarray(got)
+            quality = psnr(ref[..., :3], got[..., :3])
+            alpha_ok = bool(np.array_equal(got[..., 3], np.asarray(image)[..., 3]))
+            result = {"image": name, "app": app, **settings,
+                      "pil_ms": round(pil_s * 1e3, 1), "fused_ms": round(fused_s * 1e3, 1),
+                      "psnr_db": None if math.isinf(quality) else round(quality, 2),
+                      "max_diff": int(np.abs(ref[..., :3].astype(np.int16) - got[..., :3]).max()),
+                      "alpha_unchanged": alpha_ok}
+            results.append(result)
+            failed |= quality < args.min_psnr or not alpha_ok
+            print(f"{name:<30} {app:<7} PIL {result['pil_ms']:>7.1f} ms  fused {result['fused_ms']:>7.1f} ms"
+                  f"  PSNR {'exact' if result['psnr_db'] is None else result['psnr_db']}"
+                  f"  max diff {result['max_diff']}  alpha {'ok' if alpha_ok else 'CHANGED'}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Background-removal profile benchmark: latency and mask agreement with the reference model.
+
+    python bench_segmentation.py photos/*.jpg
+    python bench_segmentation.py photos/*.jpg --profiles fast,balanced --repeat 5 --out seg_results.json
+
+Every profile in :data:`segmentation.PROFILES` segments each photo through
+:func:`segmentation.remove_background`, exactly as the apps do: once cold
+(model load and first inference) and ``repeat`` times warm. Each profile's
+masks are compared with the reference profile's (``quality``, rembg's
+default model) by IoU of the alpha channel thresholded at 50%, so a faster
+profile can be chosen on evidence. Needs rembg and onnxruntime.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import segmentation
+
+REFERENCE = "quality"
+
+
+def iou(a, b):
+    """Intersection over union of two boolean masks (1.0 when both are empty)."""
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def run_profile(profile, images, repeat):
+    pool = segmentation.SessionPool(segmentation.PROFILES[profile]["model"])
+    start = time.perf_counter()
+    pool.warm_up()
+    load = time.perf_counter() - start
+    masks, times = [], []
+    for img in images:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cutout = segmentation.remove_background(img, profile, pool)
+            runs.append(time.perf_counter() - start)
+        times.append(float(np.median(runs)))
+        masks.append(np.asarray(cutout.getchannel("A")) >= 128)
+    return load, times, masks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("images", nargs="+", help="sample photos")
+    parser.add_argument("--profiles", help=f"comma-separated profiles ({', '.join(segmentation.PROFILES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per photo (the median is reported)")
+    parser.add_argument("--out", default="segmentation_results.json", help="JSON results path")
+    args = parser.parse_args(argv)
+
+    profiles = args.profiles.split(",") if args.profiles else list(segmentation.PROFILES)
+    unknown = [p for p in profiles if p not in segmentation.PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    profiles = [REFERENCE] + [p for p in profiles if p != REFERENCE]   # the others are scored against it
+    images = [Image.open(path).convert("RGB") for path in args.images]
+
+    results, reference = [], None
+    for profile in profiles:
+        load, times, masks = run_profile(profile, images, args.repeat)
+        if profile == REFERENCE:
+            reference = masks
+        ious = [iou(m, r) for m, r in zip(masks, reference)]
+        result = {"profile": profile, **segmentation.PROFILES[profile],
+                  "load_ms": round(load * 1e3, 1),
+                  "median_ms": round(float(np.median(times)) * 1e3, 1),
+                  "max_ms": round(max(times) * 1e3, 1),
+                  "mean_iou": round(float(np.mean(ious)), 4),
+                  "min_iou": round(min(ious), 4),
+                  "per_image": [{"image": path, "ms": round(t * 1e3, 1), "iou": round(i, 4)}
+                                for path, t, i in zip(args.images, times, ious)]}
+        results.append(result)
+        print(f"{profile:<10} {result['model']:<8} {result['max_side']:>5}px  load {result['load_ms']:>8.1f} ms"
+              f"  median {result['median_ms']:>8.1f} ms  max {result['max_ms']:>8.1f} ms"
+              f"  IoU mean {result['mean_iou']:.4f} min {result['min_iou']:.4f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sessions": segmentation.POOL_SIZE,
+        "intra_threads": segmentation.SessionPool().intra_threads,
+        "inter_threads": segmentation.INTER_THREADS,
+        "repeat": args.repeat,
+        "reference": REFERENCE,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
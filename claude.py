@@ -1,9 +1,20 @@
 import streamlit as st
-import io, requests, math, tempfile, base64, json, time, os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+import math, tempfile, base64, json, time, os, functools
+from PIL import Image, ImageDraw, ImageFont
 import numpy as np
-from moviepy.editor import ImageSequenceClip, AudioFileClip, concatenate_videoclips, CompositeVideoClip, TextClip
-from rembg import remove
+import layers
+from sprites import ProductSprite, quantize_scale
+import effects
+import text_layout
+import parallel
+import encoder
+import draft
+import timings
+import segmentation
+import enhance
+import assets
+import llm
+import taskgraph
 
 # --- GLOBAL CONFIGURATION ---
 st.set_page_config(page_title="TikTok AdGen Pro", layout="wide", page_icon="🎬")
@@ -21,6 +32,7 @@ MUSIC_TRACKS = {
     "Modern Beats": "https://archive.org/download/bensound-sweet/bensound-sweet.mp3",
     "Upbeat Pop": "https://archive.org/download/bensound-epic/bensound-epic.mp3"
 }
+assets.preload([LOGO_URL, *MUSIC_TRACKS.values()])
 
 # --- TIKTOK HASHTAG GENERATOR ---
 TRENDING_HASHTAGS = {
@@ -35,30 +47,33 @@ if "groq_key" not in st.secrets:
     st.error("🚨 Missing Secret: Add `groq_key` to your .streamlit/secrets.toml")
     st.stop()
 
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-HEADERS = {
-    "Authorization": f"Bearer {st.secrets['groq_key']}",
-    "Content-Type": "application/json"
-}
+GROQ_KEY = st.secrets["groq_key"]
 
 # --- IMAGE PROCESSING ---
-def process_image_pro(input_image):
-    """Enhanced background removal with quality optimization."""
+PRODUCT_ENHANCE = {"contrast": 1.2, "sharpness": 1.8, "color": 1.15}
+
+def segment_product(input_image, profile=segmentation.PROFILE):
     with st.spinner("🎨 AI Processing Image..."):
-        img_byte_arr = io.BytesIO()
-        input_image.save(img_byte_arr, format="PNG")
-        input_image_bytes = img_byte_arr.getvalue()
+        # Segmented on a bounded downscale; the mask is upsampled onto the full-resolution photo
+        clean_img = segmentation.remove_background(input_image, profile)
+
+    # TikTok-optimized enhancements, in one fused pass identical to the ImageEnhance chain
+    return enhance.enhance(clean_img, **PRODUCT_ENHANCE)
 
-        output_bytes = remove(input_image_bytes)
-        clean_img = Image.open(io.BytesIO(output_bytes)).convert("RGBA")
+def process_image_pro(input_image, profile=segmentation.PROFILE):
+    """Enhanced background removal with quality optimization, cached on disk per photo and profile."""
+    return segmentation.cached_cutout(input_image, lambda img: segment_product(img, profile),
+                                      segmentation.signature(profile), PRODUCT_ENHANCE)
 
-    # TikTok-optimized enhancements
-    clean_img = ImageEnhance.Contrast(clean_img).enhance(1.2)
-    clean_img = ImageEnhance.Sharpness(clean_img).enhance(1.8)
-    clean_img = ImageEnhance.Color(clean_img).enhance(1.15)
-    return clean_img
+@st.cache_resource
+def load_logo():
+    try:
+        return assets.image(LOGO_URL).resize((180, 100), Image.LANCZOS)
+    except:
+        return None
 
 # --- FONTS ---
+@functools.lru_cache(maxsize=32)
 def get_font(size, bold=True):
     font_paths = [
         "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
@@ -127,16 +142,11 @@ TEMPLATES = {
 }
 
 # --- GROQ AI ---
-def ask_groq(payload):
+def ask_groq(payload, ttl=0, refresh=False):
+    """The reply to ``payload``; with a ``ttl``, a reply cached on disk for the same request is reused."""
     try:
-        r = requests.post(GROQ_URL, json=payload, headers=HEADERS, timeout=20)
-        r.raise_for_status()
-        data = r.json()
-        choices = data.get("choices", [])
-        if choices:
-            message = choices[0].get("message", {})
-            return message.get("content", "")
-        return None
+        # Shared keep-alive client: only the first call of the process pays the TCP and TLS handshake
+        return llm.client(GROQ_KEY).chat(payload, timeout=20, ttl=ttl, refresh=refresh)
     except Exception as e:
         st.error(f"Groq API Error: {str(e)[:200]}")
         return None
@@ -181,7 +191,7 @@ def generate_tiktok_caption(product_name, price, hook):
     hashtags = TRENDING_HASHTAGS["furniture"]
     return f"{caption_text.strip()}\n\n{hashtags}\n\n#SMInteriors #KenyanBusiness"
 
-def generate_content_ideas(content_type, keyword):
+def generate_content_ideas(content_type, keyword, refresh=False):
     """Generate viral content ideas for TikTok."""
     prompts = {
         "DIY Tips": f"Generate 5 viral DIY home decor hacks for TikTok about '{keyword}'. Format as numbered list with emoji.",
@@ -201,7 +211,7 @@ def generate_content_ideas(content_type, keyword):
         "max_tokens": 600
     }
     
-    return ask_groq(payload) or "*No ideas generated. Try again.*"
+    return ask_groq(payload, ttl=llm.DAY, refresh=refresh) or "*No ideas generated. Try again.*"
 
 # --- RENDERING ---
 def hex_to_rgb(hex_color):
@@ -217,34 +227,30 @@ def draw_text_with_outline(draw, text, position, font, fill_color, outline_color
     # Draw main text
     draw.text((x, y), text, font=font, fill=fill_color)
 
-def create_tiktok_frame(t, product_img, template_name, texts):
-    """Create a single frame optimized for TikTok with trending animations."""
+def build_static_base(template_name):
+    """Gradient background, built once per template (the logo is pasted last, over everything)."""
+    T = TEMPLATES[template_name]
+    return layers.gradient(WIDTH, HEIGHT, T["bg_grad"][0], T["bg_grad"][1])
+
+def get_static_base(template_name):
+    return layers.cached_base(("claude", template_name, WIDTH, HEIGHT),
+                              lambda: build_static_base(template_name))
+
+def animation_state(t, template_name):
+    """Everything time-dependent in a frame, quantised the way it is drawn.
+
+    Frames with equal state are pixel-identical, so this doubles as the
+    render pipeline's ``frame_key``.
+    """
     T = TEMPLATES[template_name]
-    canvas = Image.new("RGBA", (WIDTH, HEIGHT))
-    draw = ImageDraw.Draw(canvas)
-    
-    # Gradient background
-    c1 = hex_to_rgb(T["bg_grad"][0])
-    c2 = hex_to_rgb(T["bg_grad"][1])
-    for y in range(HEIGHT):
-        ratio = y / HEIGHT
-        r = int(c1[0] + (c2[0] - c1[0]) * ratio)
-        g = int(c1[1] + (c2[1] - c1[1]) * ratio)
-        b = int(c1[2] + (c2[2] - c1[2]) * ratio)
-        draw.line([(0, y), (WIDTH, y)], fill=(r, g, b))
     
-    # Animated graphics based on template
+    # Animated sparkles: (index, alpha, size) of the visible ones
+    sparkles = ()
     if T.get("graphic_type") == "sparkle":
-        # Animated sparkles
         for i in range(8):
             sparkle_t = (t + i * 0.3) % 2.0
             if sparkle_t < 1.0:
-                alpha = int(255 * math.sin(sparkle_t * math.pi))
-                size = int(30 * ease_out_elastic(sparkle_t))
-                x = int(WIDTH * (0.1 + 0.8 * (i / 8)))
-                y = int(HEIGHT * (0.2 + 0.6 * ((i * 37) % 100) / 100))
-                draw.ellipse([x-size, y-size, x+size, y+size], 
-                           fill=(255, 215, 0, alpha))
+                sparkles += ((i, int(255 * math.sin(sparkle_t * math.pi)), int(30 * ease_out_elastic(sparkle_t))),)
     
     # Product showcase with zoom animation
     product_scale = 1.0
@@ -254,101 +260,139 @@ def create_tiktok_frame(t, product_img, template_name, texts):
         product_scale = 1.0 + 0.2 * ease_in_out_cubic((t - 12.0) / 3.0)
     
     # Floating animation
-    float_offset = math.sin(t * 1.5) * 20
+    float_offset = int(math.sin(t * 1.5) * 20)
+    
+    hook_y_offset = None
+    if t > 0.5:
+        hook_alpha = min(1.0, (t - 0.5) / 0.5)
+        hook_y_offset = int(50 * (1 - ease_out_elastic(hook_alpha)))
+    
+    badge_size = None
+    if t > 3.0:
+        price_scale = ease_out_elastic(min(1.0, (t - 3.0) / 0.8))
+        if price_scale > 0:
+            badge_size = (int(500 * price_scale), int(140 * price_scale))
     
-    product_h = int(HEIGHT * 0.5 * product_scale)
-    product_w = int(product_img.width * (product_h / product_img.height))
+    return sparkles, quantize_scale(product_scale), float_offset, hook_y_offset, badge_size, t > 10.0
+
+def create_tiktok_frame(t, product_img, template_name, texts, logo=None):
+    """Create a single frame optimized for TikTok with trending animations.
+
+    ``logo`` is the resized logo from :func:`load_logo`, resolved once by the caller.
+    """
+    T = TEMPLATES[template_name]
+    with timings.stage("base"):
+        base = get_static_base(template_name)
+        canvas = layers.base_canvas(base)
+    draw = ImageDraw.Draw(canvas)
+    sparkles, product_scale, float_offset, hook_y_offset, badge_size, show_cta = animation_state(t, template_name)
     
-    if product_w > 0 and product_h > 0:
-        p_resized = product_img.resize((product_w, product_h), Image.LANCZOS)
+    # Animated graphics based on template
+    with timings.stage("sparkles"):
+        for i, alpha, size in sparkles:
+            x = int(WIDTH * (0.1 + 0.8 * (i / 8)))
+            y = int(HEIGHT * (0.2 + 0.6 * ((i * 37) % 100) / 100))
+            draw.ellipse([x-size, y-size, x+size, y+size], 
+                       fill=(255, 215, 0, alpha))
+    
+    base_h = int(HEIGHT * 0.5)
+    base_w = int(product_img.width * (base_h / product_img.height))
+    
+    if base_w > 0 and base_h > 0:
+        with timings.stage("product.resize"):
+            p_resized = product_img.scaled(base_w, base_h, product_scale)
+        product_w, product_h = p_resized.size
         
-        # Shadow
-        shadow = Image.new("RGBA", (product_w + 40, product_h + 40), (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow)
-        shadow_draw.ellipse([10, 10, product_w + 30, product_h + 30], fill=(0, 0, 0, 100))
-        shadow = shadow.filter(ImageFilter.GaussianBlur(25))
+        # Shadow (cached per product size)
+        with timings.stage("product.shadow"):
+            shadow = effects.soft_shape("ellipse", (product_w + 40, product_h + 40),
+                                        (0, 0, 0, 100), blur=25)
         
         prod_x = (WIDTH - product_w) // 2
-        prod_y = int(HEIGHT * 0.35) + int(float_offset)
+        prod_y = int(HEIGHT * 0.35) + float_offset
         
-        canvas.paste(shadow, (prod_x - 20, prod_y + 40), shadow)
-        canvas.paste(p_resized, (prod_x, prod_y), p_resized)
+        with timings.stage("product.paste"):
+            canvas.paste(shadow, (prod_x - 20, prod_y + 40), shadow)
+            canvas.paste(p_resized, (prod_x, prod_y), p_resized)
     
     # Hook text (top) - TikTok style
-    if t > 0.5:
-        hook_alpha = min(1.0, (t - 0.5) / 0.5)
-        hook_y_offset = int(50 * (1 - ease_out_elastic(hook_alpha)))
-        
+    if hook_y_offset is not None:
         hook_font = get_font(90)
         hook_text = texts.get("hook", "Amazing Deal!")
         
         # Get text size for centering
-        bbox = draw.textbbox((0, 0), hook_text, font=hook_font)
+        bbox = text_layout.text_bbox(hook_text, hook_font)
         text_width = bbox[2] - bbox[0]
         hook_x = (WIDTH - text_width) // 2
         hook_y = 150 - hook_y_offset
         
-        draw_text_with_outline(draw, hook_text, (hook_x, hook_y), 
-                              hook_font, T["accent"], (0, 0, 0), 4)
+        with timings.stage("text.hook"):
+            draw_text_with_outline(draw, hook_text, (hook_x, hook_y), 
+                                  hook_font, T["accent"], (0, 0, 0), 4)
     
     # Price badge - TikTok viral style
-    if t > 3.0:
-        price_scale = ease_out_elastic(min(1.0, (t - 3.0) / 0.8))
-        if price_scale > 0:
-            badge_w = int(500 * price_scale)
-            badge_h = int(140 * price_scale)
-            badge_x = (WIDTH - badge_w) // 2
-            badge_y = int(HEIGHT * 0.75)
-            
-            # Glowing effect
-            glow = Image.new("RGBA", (badge_w + 40, badge_h + 40), (0, 0, 0, 0))
-            glow_draw = ImageDraw.Draw(glow)
-            glow_color = hex_to_rgb(T["price_bg"]) + (150,)
-            glow_draw.rounded_rectangle([10, 10, badge_w + 30, badge_h + 30], 
-                                       radius=35, fill=glow_color)
-            glow = glow.filter(ImageFilter.GaussianBlur(20))
+    if badge_size:
+        badge_w, badge_h = badge_size
+        badge_x = (WIDTH - badge_w) // 2
+        badge_y = int(HEIGHT * 0.75)
+        
+        # Glowing effect (cached per badge size)
+        glow_color = hex_to_rgb(T["price_bg"]) + (150,)
+        with timings.stage("price.glow"):
+            glow = effects.soft_shape("rounded", (badge_w + 40, badge_h + 40),
+                                      glow_color, blur=20, corner=35)
             canvas.paste(glow, (badge_x - 20, badge_y - 20), glow)
-            
-            # Main badge
-            badge_color = hex_to_rgb(T["price_bg"]) + (255,)
-            draw.rounded_rectangle([badge_x, badge_y, badge_x + badge_w, badge_y + badge_h],
-                                  radius=30, fill=badge_color)
-            
-            # Price text
-            price_font = get_font(70)
-            price_text = texts.get("price", "Ksh 49,900")
-            p_bbox = draw.textbbox((0, 0), price_text, font=price_font)
-            p_width = p_bbox[2] - p_bbox[0]
-            p_x = badge_x + (badge_w - p_width) // 2
-            p_y = badge_y + 30
-            
+        
+        # Main badge
+        badge_color = hex_to_rgb(T["price_bg"]) + (255,)
+        draw.rounded_rectangle([badge_x, badge_y, badge_x + badge_w, badge_y + badge_h],
+                              radius=30, fill=badge_color)
+        
+        # Price text
+        price_font = get_font(70)
+        price_text = texts.get("price", "Ksh 49,900")
+        p_bbox = text_layout.text_bbox(price_text, price_font)
+        p_width = p_bbox[2] - p_bbox[0]
+        p_x = badge_x + (badge_w - p_width) // 2
+        p_y = badge_y + 30
+        
+        with timings.stage("text.price"):
             draw.text((p_x, p_y), price_text, font=price_font, fill=T["price_text"])
     
     # CTA (Call to Action)
-    if t > 10.0:
+    if show_cta:
         cta_alpha = min(1.0, (t - 10.0) / 1.0)
         cta_font = get_font(50)
         cta_text = f"📱 {texts.get('contact', '0710895737')}"
         
-        c_bbox = draw.textbbox((0, 0), cta_text, font=cta_font)
+        c_bbox = text_layout.text_bbox(cta_text, cta_font)
         c_width = c_bbox[2] - c_bbox[0]
         cta_x = (WIDTH - c_width) // 2
         cta_y = int(HEIGHT * 0.88)
         
         # Pulsing effect
         pulse = 1.0 + 0.1 * math.sin(t * 3)
-        draw_text_with_outline(draw, cta_text, (int(cta_x), cta_y),
-                              cta_font, T["text"], (0, 0, 0), 3)
+        with timings.stage("text.cta"):
+            draw_text_with_outline(draw, cta_text, (int(cta_x), cta_y),
+                                  cta_font, T["text"], (0, 0, 0), 3)
     
-    # Logo (top corner)
-    try:
-        logo = Image.open(requests.get(LOGO_URL, stream=True, timeout=10).raw).convert("RGBA")
-        logo = logo.resize((180, 100), Image.LANCZOS)
-        canvas.paste(logo, (50, 50), logo)
-    except:
-        pass
+    # Logo (top corner), above the product and text
+    if logo:
+        with timings.stage("logo"):
+            canvas.paste(logo, (50, 50), logo)
     
-    return np.array(canvas.convert("RGB"))
+    with timings.stage("convert"):
+        return np.array(canvas.convert("RGB"))
+
+def frame_renderer(product_img, template_name, texts, logo):
+    """``render(t)`` of the video; render workers build theirs with it."""
+    return lambda t: create_tiktok_frame(t, product_img, template_name, texts, logo)
+
+def show_timings(panel, report_json):
+    """Stage timing breakdown in ``panel``, with the JSON for download."""
+    with panel:
+        st.dataframe(json.loads(report_json)["stages"], use_container_width=True)
+        st.download_button("Download Timings (JSON)", report_json, "render_timings.json", "application/json")
 
 # --- STREAMLIT UI ---
 st.title("🎬 TikTok AdGen Pro")
@@ -362,12 +406,25 @@ with col1:
     product_name = st.text_input("Product Name", "Walden Media Console")
     price = st.text_input("Price (e.g., Ksh 49,900)", "Ksh 49,900")
     contact = st.text_input("Contact (Phone/WhatsApp)", "0710895737")
+    segment_profile = st.selectbox("Background Removal", list(segmentation.PROFILES),
+                                   index=list(segmentation.PROFILES).index(segmentation.PROFILE),
+                                   help="Speed/quality trade-off for removing the product photo background.")
+    # The segmentation model loads and warms up in the background while the page renders
+    segmentation.shared_pool(segment_profile)
     
     st.subheader("🎨 Style & Music")
     template = st.selectbox("Template Style", list(TEMPLATES.keys()))
     music = st.selectbox("Background Track", list(MUSIC_TRACKS.keys()))
+    show_render_timings = st.checkbox("Show Render Timings", help="Time each render stage and show a breakdown table.")
     
-    generate_btn = st.button("🚀 Generate TikTok Ad", type="primary", use_container_width=True)
+    # A quick draft comes first; the full-quality render unlocks once a draft of exactly these inputs was shown
+    job_key = draft.signature(uploaded_file.getvalue() if uploaded_file else None,
+                              product_name, price, contact, template, music, segment_profile)
+    job = st.session_state.get("ad_job")
+    has_draft = job is not None and job["key"] == job_key
+    draft_btn = st.button("👀 Preview Draft", type="primary", use_container_width=True)
+    generate_btn = st.button("🚀 Approve & Generate TikTok Ad", disabled=not has_draft, use_container_width=True,
+                             help="Renders the full-quality video once you have checked the draft.")
 
 with col2:
     st.subheader("💡 Content Idea Generator")
@@ -376,125 +433,174 @@ with col2:
                                  "Before/After", "Product Showcase"])
     keyword = st.text_input("Focus Keyword", "Mid-Century Console")
     
-    if st.button("✨ Generate Ideas", use_container_width=True):
+    ideas_btn = st.button("✨ Generate Ideas", use_container_width=True)
+    # Ideas for a keyword are cached for a day; Regenerate asks the model again
+    regen_btn = st.button("🔄 Regenerate Ideas", use_container_width=True)
+    if ideas_btn or regen_btn:
         with st.spinner("Generating viral content ideas..."):
-            ideas = generate_content_ideas(content_type, keyword)
+            ideas = generate_content_ideas(content_type, keyword, refresh=regen_btn)
             st.markdown("### 🎯 Content Ideas")
             st.markdown(ideas)
             st.success("💾 Copy these ideas for your content calendar!")
 
-# --- VIDEO GENERATION ---
-if generate_btn:
+# --- DRAFT PREVIEW ---
+if draft_btn:
     if not uploaded_file:
         st.error("⚠️ Please upload a product image first!")
     else:
-        progress_container = st.container()
+        # Step 1: Process image while the hook and then the caption are generated,
+        # and the template's static background (gradient and logo) is composed
+        st.info("🎨 Step 1/2: AI Processing Image & Generating Viral Hook...")
+        timings.enable(show_render_timings)   # before the job, so its job.* stages are in the report
+        timings.reset()
+        raw_img = Image.open(uploaded_file).convert("RGBA")
+        results = taskgraph.run({
+            "image": (lambda: process_image_pro(raw_img, segment_profile), ()),
+            "hook": (lambda: generate_tiktok_hook(product_name, "viral"), ()),
+            "caption": (lambda hook: generate_tiktok_caption(product_name, price, hook), ("hook",)),
+            "base": (lambda: get_static_base(template), ()),
+        })
+        processed_img, hook, full_caption = results["image"], results["hook"], results["caption"]
         
-        with progress_container:
-            # Step 1: Process image
-            st.info("🎨 Step 1/4: AI Processing Image...")
-            raw_img = Image.open(uploaded_file).convert("RGBA")
-            processed_img = process_image_pro(raw_img)
-            
-            col_a, col_b = st.columns(2)
-            with col_a:
-                st.image(raw_img, caption="Original", use_container_width=True)
-            with col_b:
-                st.image(processed_img, caption="AI Processed", use_container_width=True)
-            
-            # Step 2: Generate hook
-            st.info("🧠 Step 2/4: Generating Viral Hook...")
-            hook = generate_tiktok_hook(product_name, "viral")
-            st.success(f"**Hook:** {hook}")
-            
-            # Step 3: Generate caption
-            full_caption = generate_tiktok_caption(product_name, price, hook)
-            with st.expander("📝 View Complete TikTok Caption"):
-                st.text_area("Copy this caption:", full_caption, height=150)
-            
-            # Step 4: Render video
-            st.info("🎬 Step 3/4: Rendering Video...")
-            
-            texts = {
-                "hook": hook,
-                "price": price,
-                "contact": contact
-            }
-            
-            frames = []
-            total_frames = FPS * DURATION
-            progress_bar = st.progress(0)
-            
-            for i in range(total_frames):
-                frame = create_tiktok_frame(i / FPS, processed_img, template, texts)
-                frames.append(frame)
-                if i % 10 == 0:
-                    progress_bar.progress((i + 1) / total_frames)
-            
-            progress_bar.progress(1.0)
-            
-            # Step 5: Add audio
-            st.info("🎵 Step 4/4: Adding Music...")
-            clip = ImageSequenceClip(frames, fps=FPS)
+        # Step 2: Quick draft render
+        st.info("👀 Step 2/2: Rendering Draft...")
+        progress_bar = st.progress(0)
+        product_sprite = ProductSprite(processed_img)
+        texts = {"hook": hook, "price": price, "contact": contact}
+        logo = load_logo()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as vf:
+            draft_path = vf.name
+        try:
+            size = draft.render_draft(
+                parallel.AppRender(__file__, "frame_renderer", (product_sprite, template, texts, logo)),
+                DURATION, draft_path, WIDTH, HEIGHT,
+                progress=lambda done, total: progress_bar.progress(done / total),
+                frame_key=lambda t: animation_state(t, template))
+            with open(draft_path, "rb") as f:
+                st.session_state.ad_job = {"key": job_key, "raw_img": raw_img, "processed_img": processed_img,
+                                           "hook": hook, "caption": full_caption,
+                                           "draft": f.read(), "draft_size": size,
+                                           "timings": timings.to_json(app="claude", mode="draft", template=template,
+                                                                      fps=draft.DRAFT_FPS)
+                                                      if show_render_timings else None}
+        finally:
+            os.unlink(draft_path)
+        st.rerun()
+
+if has_draft and not generate_btn:
+    st.subheader("👀 Draft Preview")
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.video(job["draft"])
+    with col_b:
+        st.image(job["processed_img"], caption="AI Processed", use_container_width=True)
+        st.success(f"**Hook:** {job['hook']}")
+    w, h = job["draft_size"]
+    st.caption(f"{w}x{h} at {draft.DRAFT_FPS} fps, no music. Approve it to render the full-quality video.")
+    if job.get("timings"):
+        show_timings(st.expander("⏱️ Draft Render Timings"), job["timings"])
+
+# --- VIDEO GENERATION ---
+if generate_btn:
+    progress_container = st.container()
+    
+    with progress_container:
+        # Step 1: The approved draft's processed image, hook and caption are reused as they are
+        raw_img, processed_img = job["raw_img"], job["processed_img"]
+        hook, full_caption = job["hook"], job["caption"]
+        
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.image(raw_img, caption="Original", use_container_width=True)
+        with col_b:
+            st.image(processed_img, caption="AI Processed", use_container_width=True)
+        
+        # Step 2: Hook
+        st.success(f"**Hook:** {hook}")
+        
+        # Step 3: Caption
+        with st.expander("📝 View Complete TikTok Caption"):
+            st.text_area("Copy this caption:", full_caption, height=150)
+        
+        # Step 4: Render video, with the music track fetched alongside
+        st.info("🎬 Step 1/2: Rendering Video...")
+        timings.enable(show_render_timings)
+        timings.reset()
+        music_job = taskgraph.start({"music": (lambda: assets.path(MUSIC_TRACKS[music]), ())})
+        
+        texts = {
+            "hook": hook,
+            "price": price,
+            "contact": contact
+        }
+        logo = load_logo()
+        
+        total_frames = FPS * DURATION
+        progress_bar = st.progress(0)
+        product_sprite = ProductSprite(processed_img)
+        
+        def report(done, total):
+            if done % 10 == 0:
+                progress_bar.progress(done / total)
+        
+        # Once the intro settles, frames repeat: render each state once and encode it as held frames
+        frames = parallel.render_frames(
+            parallel.AppRender(__file__, "frame_renderer", (product_sprite, template, texts, logo)),
+            total_frames, FPS, progress=report,
+            frame_key=lambda t: animation_state(t, template))
+        
+        # Render video: frames stream straight into ffmpeg as they are produced
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as vf:
+            output_path = vf.name
+        try:
+            encoder.encode_video(frames, output_path, WIDTH, HEIGHT, FPS,
+                                 preset="medium", bitrate="5000k",  # Higher quality for TikTok
+                                 hold_frames="exact", n_frames=total_frames)
+        except Exception:
+            os.unlink(output_path)
+            raise
+        
+        progress_bar.progress(1.0)
+        if show_render_timings:
+            show_timings(st.expander("⏱️ Render Timings", expanded=True),
+                         timings.to_json(app="claude", mode="final", template=template, fps=FPS))
+        
+        # Step 5: Add audio
+        st.info("🎵 Step 2/2: Adding Music...")
+        
+        try:
+            # The track is downloaded once per machine and revalidated with the asset cache's TTL
+            audio_path = music_job.result("music")
+            encoder.add_audio(output_path, audio_path, DURATION, fade_out=1.5, fps=FPS)
+        except Exception as e:
+            st.warning(f"⚠️ Audio failed, creating silent video: {e}")
+        
+        try:
+            st.success("✅ Video Ready!")
+            st.video(output_path)
             
-            audio_path = None
-            try:
-                audio_response = requests.get(MUSIC_TRACKS[music], timeout=20)
-                audio_response.raise_for_status()
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tf:
-                    tf.write(audio_response.content)
-                    audio_path = tf.name
-                
-                audio_clip = AudioFileClip(audio_path)
-                audio_clip = audio_clip.subclip(0, min(DURATION, audio_clip.duration))
-                audio_clip = audio_clip.audio_fadeout(1.5)
-                clip = clip.set_audio(audio_clip)
-            except Exception as e:
-                st.warning(f"⚠️ Audio failed, creating silent video: {e}")
+            with open(output_path, "rb") as f:
+                st.download_button(
+                    "⬇️ Download TikTok Video (1080x1920)",
+                    f,
+                    file_name=f"{product_name.replace(' ', '_')}_tiktok.mp4",
+                    mime="video/mp4",
+                    use_container_width=True
+                )
             
-            # Render final video
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as vf:
-                output_path = vf.name
+            st.info("📱 **TikTok Upload Tips:**\n"
+                   "- Upload during peak hours (6-9 PM)\n"
+                   "- Use the generated caption with hashtags\n"
+                   "- Pin the top comment with a CTA\n"
+                   "- Respond to comments within first hour")
             
+        finally:
+            # Cleanup
             try:
-                clip.write_videofile(
-                    output_path,
-                    codec="libx264",
-                    audio_codec="aac",
-                    bitrate="5000k",  # Higher quality for TikTok
-                    fps=FPS,
-                    preset="medium",
-                    logger=None
-                )
-                
-                st.success("✅ Video Ready!")
-                st.video(output_path)
-                
-                with open(output_path, "rb") as f:
-                    st.download_button(
-                        "⬇️ Download TikTok Video (1080x1920)",
-                        f,
-                        file_name=f"{product_name.replace(' ', '_')}_tiktok.mp4",
-                        mime="video/mp4",
-                        use_container_width=True
-                    )
-                
-                st.info("📱 **TikTok Upload Tips:**\n"
-                       "- Upload during peak hours (6-9 PM)\n"
-                       "- Use the generated caption with hashtags\n"
-                       "- Pin the top comment with a CTA\n"
-                       "- Respond to comments within first hour")
-                
-            finally:
-                # Cleanup
-                try:
-                    if os.path.exists(output_path):
-                        os.unlink(output_path)
-                    if audio_path and os.path.exists(audio_path):
-                        os.unlink(audio_path)
-                except:
-                    pass
+                if os.path.exists(output_path):
+                    os.unlink(output_path)
+            except:
+                pass
 
 # Footer
 st.markdown("---")
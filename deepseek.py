@@ -1,9 +1,15 @@
 import streamlit as st
 from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter
-import tempfile, os, numpy as np, io, json, random
-from moviepy.editor import ImageSequenceClip, AudioFileClip
+import tempfile, os, numpy as np, json, random, functools
 import math
-import groq
+import llm
+import layers
+import parallel
+import encoder
+import dirty
+import draft
+import timings
+import assets
 st.set_page_config(page_title="SM Interiors DIY Tips Animator", layout="wide", page_icon="💡")
 WIDTH, HEIGHT = 1080, 1920
 FPS = 30
@@ -15,6 +21,7 @@ MUSIC_FILES = {
     "Elegant Flow": "elegant_flow.mp3",
 }
 LOGO_URL = "https://ik.imagekit.io/ericmwangi/smlogo.png"
+assets.preload([LOGO_URL])
 # DIY Categories for organized content
 DIY_CATEGORIES = {
     "furniture": "🪑 Furniture Care & Restoration",
@@ -31,7 +38,7 @@ DIY_CATEGORIES = {
 def init_groq_client():
     """Initialize Groq client with API key"""
     if 'groq_key' in st.secrets:
-        return groq.Client(api_key=st.secrets['groq_key'])
+        return llm.client(st.secrets['groq_key'])
     else:
         st.error("❌ Groq API key not found. Please add 'groq_key' to Streamlit secrets.")
         return None
@@ -39,11 +46,7 @@ def init_groq_client():
 def load_logo():
     """Load logo with error handling - increased size"""
     try:
-        import requests
-        resp = requests.get(LOGO_URL, timeout=5)
-        if resp.status_code == 200:
-            logo = Image.open(io.BytesIO(resp.content)).convert("RGBA").resize((280, 140))
-            return logo
+        return assets.image(LOGO_URL).resize((280, 140))
     except:
         fallback = Image.new("RGBA", (280, 140), (0,0,0,0))
         draw = ImageDraw.Draw(fallback)
@@ -69,8 +72,8 @@ def calculate_duration(tip_text):
         return 12 # Detailed explanations
     else:
         return 15 # Comprehensive guides
-def generate_diy_content(client, category="furniture"):
-    """Generate DIY tips using Groq AI"""
+def generate_diy_content(client, category="furniture", variant=0, refresh=False):
+    """Generate DIY tips using Groq AI (cached on disk for a day per category and ``variant``)"""
     category_name = DIY_CATEGORIES[category].split(" ")[1] # Get emoji + name
     prompt = f"""
     As an interior design expert for SM Interiors, generate a DIY tip about {category_name}:
@@ -90,14 +93,9 @@ def generate_diy_content(client, category="furniture"):
     """
    
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.1-8b-instant", # Updated model
-            temperature=0.8,
-            max_tokens=500
-        )
-       
-        response = chat_completion.choices[0].message.content
+        response = client.complete(prompt, model="llama-3.1-8b-instant", # Updated model
+                                   temperature=0.8, max_tokens=500,
+                                   ttl=llm.DAY, refresh=refresh, variant=variant)
         start = response.find('{')
         end = response.rfind('}') + 1
         json_str = response[start:end]
@@ -148,12 +146,13 @@ def create_template_background(template_name):
                 draw.polygon(coords, outline="#FFD700", width=3)
    
     return bg
-def create_text_frame(t, tip_lines, tip_title, current_step, total_steps, template_name, logo=None):
-    """Create animated frame with selected template"""
-    bg = create_template_background(template_name)
-    canvas = Image.new("RGBA", (WIDTH, HEIGHT), (0,0,0,0))
-    draw = ImageDraw.Draw(canvas)
-   
+def get_template_background(template_name):
+    """Template background as an array, drawn once per template and resolution"""
+    return layers.cached_base(("deepseek", template_name, WIDTH, HEIGHT),
+                              lambda: np.array(create_template_background(template_name)))
+@functools.lru_cache(maxsize=1)
+def load_frame_fonts():
+    """Title, tip, step and CTA fonts, loaded once instead of every frame"""
     # Safe font loading with better fallback
     try:
         # Try Arial first (common on many systems)
@@ -182,6 +181,24 @@ def create_text_frame(t, tip_lines, tip_title, current_step, total_steps, templa
             cta_font = ImageFont.truetype("DejaVuSans-Bold.ttf", 50)
         except OSError:
             cta_font = ImageFont.load_default()
+    return title_font, tip_font, step_font, cta_font
+def ink_box(text, font, xy):
+    """Canvas box covering every pixel ``text`` drawn at xy can touch"""
+    l, t, r, b = font.getbbox(text)
+    return (math.floor(xy[0] + l) - 1, math.floor(xy[1] + t) - 1,
+            math.ceil(xy[0] + r) + 1, math.ceil(xy[1] + b) + 1)
+def bounds(boxes):
+    boxes = list(boxes)
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+# Frames repaint only the elements that changed since the previous frame this process rendered
+FRAME_RENDERER = dirty.DirtyRenderer()
+def create_text_frame(t, tip_lines, tip_title, current_step, total_steps, template_name, logo=None):
+    """Create animated frame with selected template"""
+    title_font, tip_font, step_font, cta_font = load_frame_fonts()
+    # Elements are drawn onto cached overlay tiles pasted onto the background; the renderer
+    # repaints a tile's box only when it moves or changes. Elements that overlap share a tile.
+    scene = []
    
     # Template-specific styling
     if template_name == "Modern Minimal":
@@ -197,43 +214,56 @@ def create_text_frame(t, tip_lines, tip_title, current_step, total_steps, templa
         text_color = "#FFFFFF"
         bg_alpha = 200
    
-    # Animated title
+    # Header: animated title, step indicator, progress bar and logo
     title_y = 100 + int(30 * math.sin(t * 2))
-    draw.text((60, title_y), tip_title, font=title_font, fill=title_color)
-   
-    # Step indicator
     step_text = f"Step {current_step} of {total_steps}"
-    step_width = draw.textlength(step_text, font=step_font)
-    draw.text((WIDTH - step_width - 60, title_y), step_text, font=step_font, fill="#FFFFFF")
-   
-    # Progress bar
+    step_x = WIDTH - step_font.getlength(step_text) - 60
     progress_width = 800
     progress_height = 12
     progress_x = (WIDTH - progress_width) // 2
     progress_y = title_y + 120
+    logo_xy = (WIDTH - 300, 40)
    
-    draw.rounded_rectangle([progress_x, progress_y, progress_x + progress_width, progress_y + progress_height],
-                          radius=6, fill="#333333")
-   
-    progress_fill = (current_step - 1) / total_steps
-    fill_width = int(progress_width * progress_fill)
-    if fill_width > 0:
-        draw.rounded_rectangle([progress_x, progress_y, progress_x + fill_width, progress_y + progress_height],
-                              radius=6, fill="#FFD700")
+    def draw_header(tile, origin):
+        ox, oy = origin
+        draw = ImageDraw.Draw(tile)
+        draw.text((60 - ox, title_y - oy), tip_title, font=title_font, fill=title_color)
+        draw.text((step_x - ox, title_y - oy), step_text, font=step_font, fill="#FFFFFF")
+       
+        bar_x, bar_y = progress_x - ox, progress_y - oy
+        draw.rounded_rectangle([bar_x, bar_y, bar_x + progress_width, bar_y + progress_height],
+                              radius=6, fill="#333333")
+        progress_fill = (current_step - 1) / total_steps
+        fill_width = int(progress_width * progress_fill)
+        if fill_width > 0:
+            draw.rounded_rectangle([bar_x, bar_y, bar_x + fill_width, bar_y + progress_height],
+                                  radius=6, fill="#FFD700")
+        if logo:
+            tile.paste(logo, (logo_xy[0] - ox, logo_xy[1] - oy), logo)
+   
+    header_boxes = [ink_box(tip_title, title_font, (60, title_y)),
+                    ink_box(step_text, step_font, (step_x, title_y)),
+                    (progress_x, progress_y, progress_x + progress_width + 1, progress_y + progress_height + 1)]
+    if logo:
+        header_boxes.append((logo_xy[0], logo_xy[1], logo_xy[0] + logo.width, logo_xy[1] + logo.height))
+    header_key = ("header", tip_title, title_color, step_text, title_y, id(logo) if logo else None)
+    with timings.stage("overlay.header"):
+        scene.append(dirty.overlay_layer(header_key, bounds(header_boxes), draw_header))
    
     # Tip lines with animation
     base_y = 600
     line_height = 100
+    tips = []
    
     for i, line in enumerate(tip_lines):
         line_delay = i * 0.3
         line_time = max(0, t - line_delay)
+        offset_x = 0
        
         if template_name == "Modern Minimal":
             offset_y = int((1 - line_time) * 50) if line_time < 1.0 else 0
             alpha = int(255 * line_time)
         elif template_name == "Luxury Gold":
-            scale = 0.8 + 0.2 * line_time if line_time < 1.0 else 1.0
             offset_y = 0
             alpha = int(255 * line_time)
         else:
@@ -245,42 +275,68 @@ def create_text_frame(t, tip_lines, tip_title, current_step, total_steps, templa
         x_pos = WIDTH // 2
        
         if alpha > 0:
-            bbox = draw.textbbox((0, 0), line, font=tip_font)
+            bbox = tip_font.getbbox(line)
             text_width = bbox[2] - bbox[0]
             text_height = bbox[3] - bbox[1]
            
             bg_padding = 25
-            bg_rect = [
+            bg_rect = (
                 x_pos - text_width//2 - bg_padding,
                 y_pos - text_height//2 - bg_padding//2,
                 x_pos + text_width//2 + bg_padding,
                 y_pos + text_height//2 + bg_padding//2
-            ]
-           
+            )
+            text_xy = (x_pos - text_width//2 + offset_x, y_pos - text_height//2)
+            tips.append((line, bg_rect, text_xy))
+   
+    # Each tip box covers the descenders of the line above, so all lines share one tile
+    def draw_tips(tile, origin):
+        ox, oy = origin
+        draw = ImageDraw.Draw(tile)
+        for line, bg_rect, (text_x, text_y) in tips:
+            rect = [bg_rect[0] - ox, bg_rect[1] - oy, bg_rect[2] - ox, bg_rect[3] - oy]
             if template_name == "Modern Minimal":
-                draw.rectangle(bg_rect, fill=(15, 10, 5, bg_alpha))
+                draw.rectangle(rect, fill=(15, 10, 5, bg_alpha))
             else:
-                draw.rounded_rectangle(bg_rect, radius=20, fill=(15, 10, 5, bg_alpha))
-           
-            final_x = x_pos - text_width//2 + (offset_x if template_name == "Geometric Art" else 0)
-            draw.text((final_x, y_pos - text_height//2), line, font=tip_font, fill=text_color)
+                draw.rounded_rectangle(rect, radius=20, fill=(15, 10, 5, bg_alpha))
+            draw.text((text_x - ox, text_y - oy), line, font=tip_font, fill=text_color)
+   
+    if tips:
+        tip_boxes = [box for line, (x0, y0, x1, y1), text_xy in tips
+                     for box in ((x0, y0, x1 + 1, y1 + 1), ink_box(line, tip_font, text_xy))]
+        tips_key = ("tips", tuple(tips), template_name, text_color)
+        with timings.stage("overlay.tips"):
+            scene.append(dirty.overlay_layer(tips_key, bounds(tip_boxes), draw_tips))
    
     # CTA
     cta_alpha = int(128 + 127 * math.sin(t * 4))
     cta_text = "👉 SWIPE UP FOR MORE DIY TIPS"
    
-    cta_width = draw.textlength(cta_text, font=cta_font)
+    cta_width = cta_font.getlength(cta_text)
     cta_x = (WIDTH - cta_width) // 2
     cta_y = HEIGHT - 150
    
-    draw.text((cta_x, cta_y), cta_text, font=cta_font, fill=(255, 255, 255, cta_alpha))
-   
-    # Logo
-    if logo:
-        canvas.paste(logo, (WIDTH - 300, 40), logo)
-   
-    bg.paste(canvas, (0, 0), canvas)
-    return np.array(bg)
+    def draw_cta(tile, origin):
+        ImageDraw.Draw(tile).text((cta_x - origin[0], cta_y - origin[1]), cta_text,
+                                  font=cta_font, fill=(255, 255, 255, cta_alpha))
+   
+    with timings.stage("overlay.cta"):
+        scene.append(dirty.overlay_layer(("cta", cta_alpha), ink_box(cta_text, cta_font, (cta_x, cta_y)), draw_cta))
+   
+    with timings.stage("background"):
+        background = get_template_background(template_name)
+    with timings.stage("composite"):
+        return FRAME_RENDERER.render(background, scene)
+
+def frame_renderer(tip_lines, tip_title, current_step, total_steps, template_name, logo):
+    """``render(t)`` of a tip video; render workers build theirs with it."""
+    return lambda t: create_text_frame(t, tip_lines, tip_title, current_step, total_steps, template_name, logo)
+
+def show_timings(panel, report_json):
+    """Stage timing breakdown in ``panel``, with the JSON for download."""
+    with panel:
+        st.dataframe(json.loads(report_json)["stages"], use_container_width=True)
+        st.download_button("Download Timings (JSON)", report_json, "render_timings.json", "application/json")
 def split_text_into_lines(text, max_chars_per_line=25):
     """Split long text into multiple lines for better readability"""
     words = text.split()
@@ -300,12 +356,13 @@ def split_text_into_lines(text, max_chars_per_line=25):
         lines.append(' '.join(current_line))
    
     return lines
-def generate_multiple_tips(client, category, count=3):
+def generate_multiple_tips(client, category, count=3, refresh=False):
     """Generate multiple tips for batch processing"""
     tips = []
     for i in range(count):
         with st.spinner(f"Generating tip {i+1} of {count}..."):
-            tip_content = generate_diy_content(client, category)
+            # Each position in the batch is its own cached variant, so the tips differ
+            tip_content = generate_diy_content(client, category, variant=i, refresh=refresh)
             tips.append({
                 "title": tip_content["title"],
                 "tip": tip_content["tip"],
@@ -334,9 +391,12 @@ with col1:
     )
    
     if mode == "Single Tip":
-        if groq_client and st.button("🎲 Generate Random DIY Tip", use_container_width=True):
+        tip_btn = groq_client and st.button("🎲 Generate Random DIY Tip", use_container_width=True)
+        # A category's tip is cached for a day; Regenerate asks the model for a new one
+        regen_btn = groq_client and st.button("🔄 Regenerate Tip", use_container_width=True)
+        if tip_btn or regen_btn:
             with st.spinner("AI is creating your DIY tip..."):
-                ai_content = generate_diy_content(groq_client, selected_category)
+                ai_content = generate_diy_content(groq_client, selected_category, refresh=bool(regen_btn))
                
                 st.session_state.ai_title = ai_content["title"]
                 st.session_state.ai_tip = ai_content["tip"]
@@ -370,9 +430,12 @@ with col1:
        
         num_tips = st.slider("Number of Tips to Generate", 2, 10, 3)
        
-        if groq_client and st.button("🚀 Generate Multiple Tips", use_container_width=True):
+        batch_btn = groq_client and st.button("🚀 Generate Multiple Tips", use_container_width=True)
+        regen_batch_btn = groq_client and st.button("🔄 Regenerate Tips", use_container_width=True)
+        if batch_btn or regen_batch_btn:
             with st.spinner(f"AI is generating {num_tips} tips..."):
-                multiple_tips = generate_multiple_tips(groq_client, selected_category, num_tips)
+                multiple_tips = generate_multiple_tips(groq_client, selected_category, num_tips,
+                                                       refresh=bool(regen_batch_btn))
                 st.session_state.multiple_tips = multiple_tips
        
         if hasattr(st.session_state, 'multiple_tips'):
@@ -405,6 +468,7 @@ with col2:
         current_step = 1 # For batch, usually step 1 of series
    
     music_key = st.selectbox("Background Music", list(MUSIC_FILES.keys()), index=0)
+    show_render_timings = st.checkbox("⏱️ Show Render Timings", help="Time each render stage and show a breakdown table.")
 # Preview for Single Tip mode
 if mode == "Single Tip" and 'tip_text' in locals():
     tip_lines = split_text_into_lines(tip_text)
@@ -425,44 +489,73 @@ if mode == "Single Tip" and 'tip_text' in locals():
     )
     st.image(Image.fromarray(preview_frame), use_column_width=True)
     st.caption(f"Preview of {template} template - {duration} seconds")
+def render_tip_draft(tip_lines, tip_title, current_step, total_steps, template_name, logo, duration):
+    """Quick low-res, low-fps draft of a tip video, as (mp4 bytes, (width, height))"""
+    draft_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+    try:
+        size = draft.render_draft(
+            parallel.AppRender(__file__, "frame_renderer",
+                               (tip_lines, tip_title, current_step, total_steps, template_name, logo)),
+            duration, draft_path, WIDTH, HEIGHT)
+        with open(draft_path, "rb") as f:
+            return f.read(), size
+    finally:
+        os.unlink(draft_path)
 # GENERATE VIDEO
+# A quick draft comes first; the full-quality render unlocks once a draft of exactly these inputs was shown
 if mode == "Single Tip":
-    if st.button("🚀 GENERATE DIY TIP VIDEO", type="primary", use_container_width=True):
+    job_key = draft.signature(tip_title, tip_text, current_step, total_steps, template, music_key)
+    if st.button("👀 PREVIEW DRAFT VIDEO", use_container_width=True):
+        if not tip_text.strip():
+            st.error("Please enter a DIY tip!")
+        else:
+            with st.spinner("Rendering a quick draft..."):
+                timings.enable(show_render_timings)
+                timings.reset()
+                st.session_state.draft_video, st.session_state.draft_size = render_tip_draft(
+                    split_text_into_lines(tip_text), tip_title, current_step, total_steps, template,
+                    load_logo(), calculate_duration(tip_text))
+                st.session_state.draft_timings = (timings.to_json(app="deepseek", mode="draft", template=template,
+                                                                  fps=draft.DRAFT_FPS)
+                                                  if show_render_timings else None)
+                st.session_state.draft_key = job_key
+    has_draft = st.session_state.get("draft_key") == job_key
+    if has_draft:
+        st.video(st.session_state.draft_video)
+        w, h = st.session_state.draft_size
+        st.caption(f"Draft: {w}x{h} at {draft.DRAFT_FPS} fps, no music. Approve it to render the full-quality video.")
+        if st.session_state.get("draft_timings"):
+            show_timings(st.expander("⏱️ Draft Render Timings"), st.session_state.draft_timings)
+    if st.button("🚀 APPROVE & GENERATE DIY TIP VIDEO", type="primary", use_container_width=True,
+                 disabled=not has_draft, help="Renders the full-quality video once you have checked the draft."):
         if not tip_text.strip():
             st.error("Please enter a DIY tip!")
         else:
             with st.spinner("Creating your professional DIY tip video..."):
-                frames = []
                 logo_img = load_logo()
                 tip_lines = split_text_into_lines(tip_text)
                 duration = calculate_duration(tip_text)
+                timings.enable(show_render_timings)
+                timings.reset()
                
-                for i in range(FPS * duration):
-                    t = i / FPS
-                    frame = create_text_frame(t, tip_lines, tip_title, current_step, total_steps, template, logo_img)
-                    frames.append(frame)
+                frames = parallel.render_frames(
+                    parallel.AppRender(__file__, "frame_renderer",
+                                       (tip_lines, tip_title, current_step, total_steps, template, logo_img)),
+                    FPS * duration, FPS)
                
-                clip = ImageSequenceClip(frames, fps=FPS)
+                video_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+                encoder.encode_video(frames, video_path, WIDTH, HEIGHT, FPS, preset="fast", threads=4)
+                if show_render_timings:
+                    show_timings(st.expander("⏱️ Render Timings", expanded=True),
+                                 timings.to_json(app="deepseek", mode="final", template=template, fps=FPS))
                
                 audio_path = os.path.join(AUDIO_DIR, MUSIC_FILES[music_key])
                 if os.path.exists(audio_path):
                     try:
-                        audio = AudioFileClip(audio_path).subclip(0, min(duration, AudioFileClip(audio_path).duration))
-                        clip = clip.set_audio(audio)
+                        encoder.add_audio(video_path, audio_path, duration)
                     except Exception as e:
                         st.warning(f"Audio skipped: {e}. Using video only.")
                
-                video_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-                clip.write_videofile(
-                    video_path,
-                    fps=FPS,
-                    codec="libx264",
-                    audio_codec="aac" if os.path.exists(audio_path) else None,
-                    threads=4,
-                    preset="fast",
-                    logger=None
-                )
-               
                 st.success("✅ PROFESSIONAL DIY TIP VIDEO READY!")
                 st.video(video_path)
                
@@ -484,47 +577,61 @@ if mode == "Single Tip":
                         st.text_area("🏷️ Copy these hashtags:", st.session_state.ai_hashtags, height=100, key="final_hashtags")
                
                 os.unlink(video_path)
-                clip.close()
-                if 'audio' in locals():
-                    audio.close()
 else: # Multiple Tips mode
-    if hasattr(st.session_state, 'multiple_tips') and st.button("🎬 GENERATE ALL VIDEOS", type="primary", use_container_width=True):
+    tips = st.session_state.get("multiple_tips")
+    job_key = draft.signature(tips, total_steps, template, music_key)
+    if tips and st.button("👀 PREVIEW ALL DRAFTS", use_container_width=True):
+        with st.spinner("Rendering quick drafts..."):
+            logo_img = load_logo()
+            timings.enable(show_render_timings)
+            timings.reset()
+            st.session_state.batch_drafts = [
+                render_tip_draft(split_text_into_lines(tip['tip']), tip['title'], 1, total_steps, template,
+                                 logo_img, tip['duration'])
+                for tip in tips]
+            st.session_state.batch_draft_timings = (timings.to_json(app="deepseek", mode="draft", template=template,
+                                                                    fps=draft.DRAFT_FPS, videos=len(tips))
+                                                    if show_render_timings else None)
+            st.session_state.batch_draft_key = job_key
+    has_draft = st.session_state.get("batch_draft_key") == job_key
+    if tips and has_draft:
+        draft_cols = st.columns(min(3, len(tips)))
+        for i, (tip, (video, size)) in enumerate(zip(tips, st.session_state.batch_drafts)):
+            with draft_cols[i % len(draft_cols)]:
+                st.video(video)
+                st.caption(f"Draft {i+1}: {tip['title']}")
+        if st.session_state.get("batch_draft_timings"):
+            show_timings(st.expander("⏱️ Draft Render Timings"), st.session_state.batch_draft_timings)
+    if tips and st.button("🎬 APPROVE & GENERATE ALL VIDEOS", type="primary", use_container_width=True,
+                          disabled=not has_draft, help="Renders the full-quality videos once you have checked the drafts."):
         with st.spinner("Creating batch videos... This may take a few minutes"):
             logo_img = load_logo()
+            timings.enable(show_render_timings)
            
             for i, tip in enumerate(st.session_state.multiple_tips):
                 st.write(f"**Generating video {i+1} of {len(st.session_state.multiple_tips)}: {tip['title']}**")
                
                 tip_lines = split_text_into_lines(tip['tip'])
                 duration = tip['duration']
-                frames = []
-               
-                for frame_num in range(FPS * duration):
-                    t = frame_num / FPS
-                    frame = create_text_frame(t, tip_lines, tip['title'], 1, total_steps, template, logo_img)
-                    frames.append(frame)
+                timings.reset()
+                frames = parallel.render_frames(
+                    parallel.AppRender(__file__, "frame_renderer",
+                                       (tip_lines, tip['title'], 1, total_steps, template, logo_img)),
+                    FPS * duration, FPS)
                
-                clip = ImageSequenceClip(frames, fps=FPS)
+                video_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+                encoder.encode_video(frames, video_path, WIDTH, HEIGHT, FPS, preset="fast", threads=4)
+                if show_render_timings:
+                    show_timings(st.expander(f"⏱️ Render Timings for Tip {i+1}"),
+                                 timings.to_json(app="deepseek", mode="final", template=template, fps=FPS, tip=i + 1))
                
                 audio_path = os.path.join(AUDIO_DIR, MUSIC_FILES[music_key])
                 if os.path.exists(audio_path):
                     try:
-                        audio = AudioFileClip(audio_path).subclip(0, min(duration, AudioFileClip(audio_path).duration))
-                        clip = clip.set_audio(audio)
+                        encoder.add_audio(video_path, audio_path, duration)
                     except Exception as e:
                         st.warning(f"Audio skipped for tip {i+1}: {e}")
                
-                video_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-                clip.write_videofile(
-                    video_path,
-                    fps=FPS,
-                    codec="libx264",
-                    audio_codec="aac" if os.path.exists(audio_path) else None,
-                    threads=4,
-                    preset="fast",
-                    logger=None
-                )
-               
                 # Download button for each video
                 with open(video_path, "rb") as f:
                     st.download_button(
@@ -543,9 +650,6 @@ else: # Multiple Tips mode
                         st.text_area("Hashtags", tip['hashtags'], height=100, key=f"batch_hashtags_{i}")
                
                 os.unlink(video_path)
-                clip.close()
-                if 'audio' in locals():
-                    audio.close()
 # FEATURES SHOWCASE
 st.markdown("---")
 st.subheader("✨ Smart Features")
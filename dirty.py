@@ -0,0 +1,152 @@
+"""Dirty-rectangle incremental frame rendering.
+
+A frame is a cached static base plus an ordered list of layers, each with a
+content key, the canvas box it covers and a paint function. The renderer
+keeps the previous frame buffer and its layers; for the next frame it copies
+that buffer and repaints only the boxes of layers that appeared, disappeared,
+moved or changed. Each dirty box is reset from the base and every layer that
+touches it is re-composited, clipped to the box, in order. Layers paint per
+pixel, so the result is bit-identical to repainting the whole frame.
+"""
+from typing import Callable, Hashable, NamedTuple
+
+import numpy as np
+from PIL import Image
+
+import text_sprites
+from layers import blend, clip_box
+from lru import LRUCache
+
+FULL_REPAINT_RATIO = 0.6   # past this much dirty area a full repaint is cheaper
+
+_PIXELS = LRUCache(max_entries=64)
+_OVERLAYS = LRUCache(max_entries=256)
+
+
+class Layer(NamedTuple):
+    key: Hashable        # equal key and box means identical pixels
+    box: tuple           # (x0, y0, x1, y1) on the canvas
+    paint: Callable      # paint(frame, clip) composites the layer, touching only ``clip``
+
+
+def pixels(img):
+    """uint8 RGBA array of a PIL image, cached per image object (kept alive with the entry)."""
+    entry = _PIXELS.get(id(img))
+    if entry is None or entry[0] is not img:
+        entry = _PIXELS.put(id(img), (img, np.asarray(img.convert("RGBA"))))
+    return entry[1]
+
+
+def image_layer(img, xy, key=None):
+    """Layer that pastes an RGBA PIL image exactly like ``canvas.paste(img, xy, img)``.
+
+    The paint function holds ``img`` itself, so while the layer is alive its
+    ``id()`` (the default key) cannot be handed to another image.
+    """
+    src = pixels(img)
+    x, y = int(xy[0]), int(xy[1])
+    return Layer(key or ("image", id(img)), (x, y, x + src.shape[1], y + src.shape[0]),
+                 lambda frame, clip, img=img: blend(frame, src, (x, y), clip))
+
+
+def overlay_layer(key, box, draw):
+    """Layer for elements drawn together onto one transparent overlay tile covering ``box``.
+
+    ``draw(tile, (x0, y0))`` paints in canvas coordinates minus the box origin,
+    so elements that overlap overwrite each other exactly as they would on a
+    full-frame overlay pasted once. Tiles are cached by ``key``, which must
+    capture everything ``draw`` paints.
+    """
+    x0, y0, x1, y1 = box
+
+    def build():
+        tile = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        draw(tile, (x0, y0))
+        return tile, draw   # draw's closure stays alive with the tile, so ids in ``key`` stay unique
+
+    tile, _ = _OVERLAYS.get_or_build((key, box), build)
+    return image_layer(tile, (x0, y0), key=("overlay", key, box))
+
+
+def sprite_layer(sprite, opacity=1.0, key=None):
+    """Layer that composites a :class:`text_sprites.Sprite` at ``opacity``.
+
+    Pass a ``key`` for sprites rebuilt every frame; cached sprites are keyed by identity.
+    """
+    return Layer(key or ("sprite", id(sprite), opacity), sprite.box,
+                 lambda frame, clip: text_sprites.composite(frame, sprite, opacity, clip))
+
+
+def merge_boxes(boxes):
+    """Merge overlapping boxes into their bounding boxes until none overlap."""
+    merged = []
+    for box in boxes:
+        while True:
+            hit = next((m for m in merged if clip_box(m, box)), None)
+            if hit is None:
+                break
+            merged.remove(hit)
+            box = (min(box[0], hit[0]), min(box[1], hit[1]), max(box[2], hit[2]), max(box[3], hit[3]))
+        merged.append(box)
+    return merged
+
+
+class DirtyRenderer:
+    """Renders layer lists over a base, repainting only what changed since the previous call.
+
+    One renderer per frame stream (and per process): it diffs against whatever
+    it rendered last, so frames may arrive in any order. With
+    ``incremental=False`` every frame is a full repaint.
+    """
+
+    def __init__(self, incremental=True):
+        self.incremental = incremental
+        self._base = None
+        self._frame = None
+        self._layers = ()   # their paint closures hold the keyed images and sprites, so ids stay unique
+
+    def render(self, base, layers):
+        """A new uint8 frame: ``layers`` composited in order over ``base``."""
+        layers = list(layers)
+        if not self.incremental or self._frame is None or self._base is not base:
+            self._repaint_all(base, layers)
+        else:
+            dirty = self._dirty_boxes(layers)
+            h, w = base.shape[:2]
+            if dirty is None or sum((b[2] - b[0]) * (b[3] - b[1]) for b in dirty) > FULL_REPAINT_RATIO * w * h:
+                self._repaint_all(base, layers)
+            else:
+                for box in dirty:
+                    self._repaint(box, layers)
+        self._layers = layers
+        return self._frame.copy()
+
+    def _dirty_boxes(self, layers):
+        """Boxes to repaint, or None when layers were reordered (repaint everything)."""
+        h, w = self._base.shape[:2]
+        old = [(l.key, l.box) for l in self._layers]
+        new = [(l.key, l.box) for l in layers]
+        if old == new:
+            return []
+        kept = set(old) & set(new)
+        if [s for s in old if s in kept] != [s for s in new if s in kept]:
+            return None
+        changed = [box for _, box in set(old) ^ set(new)]
+        return merge_boxes(b for b in (clip_box(box, (0, 0, w, h)) for box in changed) if b)
+
+    def _repaint_all(self, base, layers):
+        self._base = base
+        self._frame = np.array(base)
+        h, w = base.shape[:2]
+        for layer in layers:
+            clip = clip_box(layer.box, (0, 0, w, h))
+            if clip:
+                layer.paint(self._frame, clip)
+
+    def _repaint(self, box, layers):
+        x0, y0, x1, y1 = box
+        self._frame[y0:y1, x0:x1] = self._base[y0:y1, x0:x1]
+        for layer in layers:
+            clip = clip_box(layer.box, box)
+            if clip:
+                layer.paint(self._frame, clip)
@@ -0,0 +1,101 @@
+"""Content-addressed blob cache on disk, bounded in size with LRU eviction.
+
+Entries are files named by the SHA-256 of their key parts, so they survive
+app restarts and can be shared by every app process on the machine. A hit
+bumps the file's mtime; when the directory grows past ``max_bytes`` the
+least recently used files are deleted. Writes go to a temporary file that is
+renamed into place, so readers never see a half-written entry.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+CACHE_ROOT = os.environ.get("ADGEN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "adgen"))
+
+
+def digest(*parts):
+    """Hex SHA-256 of ``parts`` (bytes as they are, anything else by ``repr``)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, (bytes, bytearray, memoryview)) else repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DiskCache:
+    """Bytes stored under ``directory`` by key, kept under ``max_bytes`` in total."""
+
+    def __init__(self, directory, max_bytes=512 * 2**20, suffix=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """The stored bytes for ``key``, or None."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """Store ``data`` under ``key``; failures only mean the entry is not cached."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self.path(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return data
+        self.evict()
+        return data
+
+    def get_or_build(self, key, build):
+        """Cached bytes for ``key``, calling ``build()`` and storing its bytes on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = self.put(key, build())
+        return data
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            entries, total = [], 0
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.is_file() and entry.name.endswith(self.suffix) and not entry.name.endswith(".tmp"):
+                            st = entry.stat()
+                            entries.append((st.st_mtime, st.st_size, entry.path))
+                            total += st.st_size
+            except OSError:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
@@ -3,7 +3,7 @@ from moviepy.editor import *
 from moviepy.config import change_settings
 import numpy as np
 import textwrap
-from groq import Groq
+import llm
 import json
 
 # Configure ImageMagick for MoviePy
@@ -11,7 +11,7 @@ change_settings({"IMAGEMAGICK_BINARY": "/usr/bin/convert"})
 
 # Function to generate DIY tips using Groq AI
 def generate_diy_tips(num_tips=5):
-    client = Groq(api_key=st.secrets["groq_key"])
+    client = llm.client(st.secrets["groq_key"])
     prompt = f"""
     Generate {num_tips} creative DIY interior design tips for SM Interiors. 
     Each tip should be in the following JSON format:
@@ -24,14 +24,8 @@ def generate_diy_tips(num_tips=5):
     Output as a JSON list of these objects.
     """
     
-    completion = client.chat.completions.create(
-        model="mixtral-8x7b-32768",  # Or use a faster model like llama
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_tokens=1024,
-    )
-    
-    response = completion.choices[0].message.content
+    response = client.complete(prompt, model="mixtral-8x7b-32768",  # Or use a faster model like llama
+                               temperature=0.7, max_tokens=1024)
     try:
         tips = json.loads(response)
     except:
@@ -175,4 +169,4 @@ if st.button("Generate TikTok Video"):
     # Display video in Streamlit
     st.video(video_path)
 
-st.markdown("Note: \n- This app requires MoviePy, Groq, and FFmpeg installed. Install via `pip install moviepy groq`.\n- For Streamlit Cloud, create a `packages.txt` file in your repo with:\n```\nimagemagick\nfonts-dejavu\n```\n- This ensures ImageMagick is installed for text rendering and fonts are available.\n- Coordinates are in pixels, with (0,0) at top-left. Use 'center' for automatic centering on that axis.")
+st.markdown("Note: \n- This app requires MoviePy, Groq, and FFmpeg installed. Install via `pip install moviepy httpx`.\n- For Streamlit Cloud, create a `packages.txt` file in your repo with:\n```\nimagemagick\nfonts-dejavu\n```\n- This ensures ImageMagick is installed for text rendering and fonts are available.\n- Coordinates are in pixels, with (0,0) at top-left. Use 'center' for automatic centering on that axis.")
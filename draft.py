@@ -0,0 +1,73 @@
+"""Draft previews.
+
+A draft renders the same scene at a low frame rate and encodes it at a
+quarter of the pixels with the fastest encoder preset, so a marketer can
+check an ad in seconds before the full-quality render is spent on it. The
+scenes are laid out in final-resolution pixels, so draft frames are
+rendered at full size and box-filtered down before encoding: the lower
+frame rate cuts rendering, the smaller frames cut encoding.
+"""
+import hashlib
+
+import numpy as np
+
+import encoder
+import parallel
+
+DRAFT_FPS = 12
+DRAFT_SCALE = 2   # per axis, so a draft has a quarter of the pixels
+DRAFT_ENCODE = {"preset": "ultrafast", "crf": 30}
+
+
+def signature(*parts):
+    """Stable digest of a render's inputs, to tie an approved draft to exactly what it showed."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def draft_size(width, height, scale=DRAFT_SCALE):
+    """Draft frame size, rounded down to even dimensions for yuv420p."""
+    return width // scale // 2 * 2, height // scale // 2 * 2
+
+
+def downscale(frame, scale=DRAFT_SCALE):
+    """Box-filter an (H, W, 3|4) uint8 frame down by ``scale`` per axis to RGB."""
+    h, w = frame.shape[:2]
+    dw, dh = draft_size(w, h, scale)
+    rgb = np.asarray(frame)[:dh * scale, :dw * scale, :3]
+    n = scale * scale
+    # Summing the strided sub-grids is much faster than a reduction over reshaped block axes
+    total = np.full((dh, dw, 3), n // 2, dtype=np.uint16)
+    for dy in range(scale):
+        for dx in range(scale):
+            total += rgb[dy::scale, dx::scale]
+    return (total // n).astype(np.uint8)
+
+
+def _downscaled(frames, scale):
+    prev = small = None
+    for frame in frames:
+        # Held frames arrive as the same object; keep them the same object so the encoder reuses the buffer
+        if frame is not prev:
+            prev, small = frame, downscale(frame, scale)
+        yield small
+
+
+def render_draft(render, duration, path, width, height, fps=DRAFT_FPS, scale=DRAFT_SCALE,
+                 progress=None, frame_key=None):
+    """Render ``render(t)`` over ``duration`` seconds at ``fps`` and encode a silent draft to ``path``.
+
+    ``render`` (a :class:`parallel.AppRender` or a callable) returns full-size
+    ``width`` x ``height`` frames; it, ``progress`` and ``frame_key`` are passed
+    to :func:`parallel.render_frames`. Returns the
+    draft's ``(width, height)``.
+    """
+    n_frames = int(round(duration * fps))
+    size = draft_size(width, height, scale)
+    frames = parallel.render_frames(render, n_frames, fps, progress=progress, frame_key=frame_key)
+    encoder.encode_video(_downscaled(frames, scale), path, size[0], size[1], fps,
+                         hold_frames="exact", n_frames=n_frames, **DRAFT_ENCODE)
+    return size
@@ -0,0 +1,80 @@
+"""Soft shadows and glows for the frame renderers.
+
+Wide Gaussian blurs at full resolution dominate the intro frames, so every
+effect here is blurred on a downsampled alpha mask (PIL's box-approximated
+Gaussian), upsampled back and cached. Callers ask for the exact size they
+need; sizes already come quantised from the sprite stage, so the cache hits
+on every frame once an animation settles.
+"""
+import math
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from lru import LRUCache
+
+DOWNSCALE = 4          # blur at 1/4 resolution when the radius allows it
+MIN_SMALL_RADIUS = 2   # keep at least this blur radius after downscaling
+
+_CACHE = LRUCache(max_entries=96)
+
+
+def blur_mask(mask, radius):
+    """Gaussian-blur an "L" mask at reduced resolution and upsample it back."""
+    factor = max(1, min(DOWNSCALE, int(radius // MIN_SMALL_RADIUS)))
+    if factor == 1:
+        return mask.filter(ImageFilter.GaussianBlur(radius))
+    w, h = mask.size
+    small = mask.resize((math.ceil(w / factor), math.ceil(h / factor)), Image.BOX)
+    small = small.filter(ImageFilter.GaussianBlur(radius / factor))
+    return small.resize((w, h), Image.BILINEAR)
+
+
+def _colorize(mask, fill):
+    """Solid ``fill`` colour whose alpha is ``mask`` scaled by the fill's own alpha."""
+    rgb, alpha = tuple(fill[:3]), (fill[3] if len(fill) > 3 else 255)
+    out = Image.new("RGBA", mask.size, rgb + (0,))
+    if alpha != 255:
+        mask = mask.point([v * alpha // 255 for v in range(256)])
+    out.putalpha(mask)
+    return out
+
+
+def soft_shape(shape, size, fill, blur, inset=10, corner=0):
+    """A blurred ellipse or rounded rectangle drawn ``inset`` px inside an image of ``size``."""
+    key = ("shape", shape, tuple(size), tuple(fill), blur, inset, corner)
+    return _CACHE.get_or_build(key, lambda: _build_shape(shape, size, fill, blur, inset, corner))
+
+
+def _build_shape(shape, size, fill, blur, inset, corner):
+    w, h = size
+    mask = Image.new("L", (w, h), 0)
+    draw = ImageDraw.Draw(mask)
+    box = [inset, inset, w - inset, h - inset]
+    if shape == "ellipse":
+        draw.ellipse(box, fill=255)
+    else:
+        draw.rounded_rectangle(box, radius=corner, fill=255)
+    return _colorize(blur_mask(mask, blur), fill)
+
+
+def drop_shadow(sprite, blur=20, color=(0, 0, 0, 140)):
+    """Soft silhouette shadow for an RGBA sprite, padded by ``2 * blur`` on every side.
+
+    Cached per sprite object, so pass the cached renditions from the sprite stage.
+    """
+    key = ("shadow", id(sprite), blur, tuple(color))
+    entry = _CACHE.get(key)
+    if entry is None:
+        entry = _CACHE.put(key, (sprite, _build_shadow(sprite, blur, color)))
+    return entry[1]
+
+
+def _build_shadow(sprite, blur, color):
+    pad = int(blur * 2)
+    mask = Image.new("L", (sprite.width + 2 * pad, sprite.height + 2 * pad), 0)
+    mask.paste(sprite.getchannel("A"), (pad, pad))
+    return _colorize(blur_mask(mask, blur), color)
+
+
+def clear():
+    _CACHE.clear()
@@ -0,0 +1,171 @@
+"""Streaming video encoder.
+
+Frames are written straight into an ffmpeg subprocess's stdin as raw RGB as
+soon as they are rendered, through a small bounded queue drained by a writer
+thread, so rendering and encoding overlap and peak memory stays at a few
+frames whatever the duration. Audio is muxed in a second, stream-copy pass.
+
+In hold mode ffmpeg drops frames that repeat the previous one (exactly or
+within a small difference) before they reach the encoder and writes a
+variable-frame-rate stream, so each static stretch becomes one held frame.
+"""
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+
+import imageio_ffmpeg
+import numpy as np
+
+QUEUE_SIZE = 8   # frames buffered between the renderer and ffmpeg
+
+# mpdecimate thresholds per hold mode: "exact" only drops bit-identical frames,
+# "near" also drops frames whose 8x8 blocks barely changed (ffmpeg's defaults)
+HOLD_MODES = {
+    "exact": "hi=0:lo=0:frac=0",
+    "near": "hi=768:lo=320:frac=0.33",
+}
+
+
+def ffmpeg_exe():
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _run(cmd, stdin=None):
+    """Start ffmpeg with stderr going to a temp file, so a chatty encoder can never block on it."""
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=log)
+    return proc, log
+
+
+def _check(proc, log, what):
+    if proc.wait() != 0:
+        log.seek(0)
+        tail = log.read().decode("utf-8", "replace").strip()[-2000:]
+        log.close()
+        raise RuntimeError(f"ffmpeg {what} failed ({proc.returncode}): {tail}")
+    log.close()
+
+
+def _timescale(fps):
+    """A 1/fps mp4 track timescale, which keeps every held frame's duration exact."""
+    if fps and float(fps).is_integer():
+        return ["-video_track_timescale", str(int(fps))]
+    return []
+
+
+def _hold_filter(mode, n_frames):
+    """Drop repeated frames, except the last one so a static tail still lasts to the end."""
+    last = n_frames - 1
+    return (f"split[a][b];[a]select='lt(n\\,{last})',mpdecimate={HOLD_MODES[mode]}[held];"
+            f"[b]select='eq(n\\,{last})'[tail];[held][tail]interleave")
+
+
+def _pump(frames, stdin, errors):
+    """Writer thread: feed queued frames to ffmpeg; after a failure keep draining so the producer never blocks."""
+    prev = buf = None
+    while True:
+        frame = frames.get()
+        if frame is None:
+            break
+        if errors:
+            continue
+        try:
+            # Held frames arrive as the same array object again; reuse its RGB buffer
+            if frame is not prev:
+                prev, buf = frame, memoryview(np.ascontiguousarray(frame[:, :, :3], dtype=np.uint8))
+            stdin.write(buf)
+        except Exception as e:
+            errors.append(e)
+    try:
+        stdin.close()
+    except OSError:
+        pass
+
+
+def encode_video(frames, path, width, height, fps, codec="libx264", preset="medium",
+                 crf=None, bitrate=None, threads=None, queue_size=QUEUE_SIZE,
+                 hold_frames=None, n_frames=None):
+    """Encode an iterable of (H, W, 3|4) uint8 frames to ``path`` without buffering them.
+
+    ``frames`` is consumed on the calling thread (so progress callbacks in a
+    generator still run there). ``hold_frames`` ("exact" or "near") encodes
+    repeated frames as held frames; it needs the total ``n_frames`` up front.
+    Returns the number of frames written.
+    """
+    cmd = [ffmpeg_exe(), "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+           "-i", "-", "-an"]
+    if hold_frames:
+        if hold_frames not in HOLD_MODES:
+            raise ValueError(f"unknown hold mode {hold_frames!r}; expected one of {sorted(HOLD_MODES)}")
+        if not n_frames:
+            raise ValueError("hold_frames needs n_frames")
+        cmd += ["-vf", _hold_filter(hold_frames, n_frames), "-fps_mode", "vfr"] + _timescale(fps)
+    cmd += ["-c:v", codec, "-preset", preset, "-pix_fmt", "yuv420p"]
+    if crf is not None:
+        cmd += ["-crf", str(crf)]
+    if bitrate:
+        cmd += ["-b:v", str(bitrate)]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += ["-movflags", "+faststart", path]
+
+    proc, log = _run(cmd, stdin=subprocess.PIPE)
+    pending = queue.Queue(maxsize=queue_size)
+    errors = []
+    writer = threading.Thread(target=_pump, args=(pending, proc.stdin, errors), daemon=True)
+    writer.start()
+
+    count = 0
+    try:
+        for frame in frames:
+            frame = np.asarray(frame)
+            if frame.shape[:2] != (height, width):
+                raise ValueError(f"frame {count} is {frame.shape[1]}x{frame.shape[0]}, expected {width}x{height}")
+            pending.put(frame)
+            count += 1
+            if errors:
+                break
+    except BaseException:
+        proc.kill()
+        pending.put(None)
+        writer.join()
+        proc.wait()
+        log.close()
+        raise
+    pending.put(None)
+    writer.join()
+    _check(proc, log, "encode")
+    if errors:
+        raise RuntimeError(f"ffmpeg stopped accepting frames after {count}: {errors[0]}")
+    return count
+
+
+def mux_audio(video_path, audio_path, out_path, duration, fade_out=0.0, audio_codec="aac", fps=None):
+    """Copy the video stream and add ``audio_path`` trimmed to ``duration``, fading out over the last ``fade_out`` s.
+
+    Pass the video's ``fps`` for streams written with ``hold_frames``.
+    """
+    cmd = [ffmpeg_exe(), "-y", "-loglevel", "error", "-i", video_path, "-i", audio_path,
+           "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", audio_codec, "-t", f"{duration:.3f}"]
+    cmd += _timescale(fps)
+    if fade_out:
+        cmd += ["-af", f"afade=t=out:st={max(0.0, duration - fade_out):.3f}:d={fade_out:.3f}"]
+    cmd += ["-movflags", "+faststart", out_path]
+    proc, log = _run(cmd)
+    _check(proc, log, "mux")
+
+
+def add_audio(video_path, audio_path, duration, fade_out=0.0, audio_codec="aac", fps=None):
+    """:func:`mux_audio` in place: ``video_path`` is replaced by the muxed file."""
+    fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(video_path)[1] or ".mp4",
+                               dir=os.path.dirname(video_path) or None)
+    os.close(fd)
+    try:
+        mux_audio(video_path, audio_path, tmp, duration, fade_out, audio_codec, fps)
+        os.replace(tmp, video_path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
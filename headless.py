@@ -0,0 +1,98 @@
+"""An app script's definitions, loaded without running its Streamlit UI.
+
+The apps are Streamlit scripts: importing one runs the whole page. Render
+workers (:mod:`parallel`) and ``bench.py`` only need the frame functions, so
+:func:`load_app` runs just the script's imports, functions, classes and
+upper-case constants, against a headless stand-in for ``streamlit``.
+Dependencies only the UI needs (rembg, groq, requests, ...) are bound to
+None when they are not installed, or always with ``skip_ui``.
+"""
+import ast
+import functools
+import os
+import sys
+
+UI_ONLY_MODULES = {"rembg", "groq", "requests", "moviepy", "replicate", "mistralai"}
+
+
+class _Secrets(dict):
+    def __missing__(self, key):
+        return ""
+
+
+class HeadlessStreamlit:
+    """Enough of ``streamlit`` for module-level code: memoizing cache decorators, empty secrets, no-op calls."""
+
+    secrets = _Secrets()
+
+    def cache_resource(self, func=None, **kwargs):
+        if func is None:
+            return self.cache_resource
+        memo = {}
+
+        @functools.wraps(func)
+        def cached(*args, **kw):
+            try:
+                key = (args, tuple(sorted(kw.items())))
+                if key not in memo:
+                    memo[key] = func(*args, **kw)
+                return memo[key]
+            except TypeError:   # unhashable arguments: no caching
+                return func(*args, **kw)
+        return cached
+
+    cache_data = cache_resource
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _bind_import(node, ns, path, skip_ui):
+    """Run one import statement, standing in for streamlit and skipping UI-only dependencies."""
+    module = node.module if isinstance(node, ast.ImportFrom) else node.names[0].name
+    root = (module or "").split(".")[0]
+    if root == "streamlit":
+        for alias in node.names:
+            ns[alias.asname or alias.name] = HeadlessStreamlit()
+        return
+    # One statement per name, so ``import io, requests`` still binds io without requests
+    if isinstance(node, ast.Import):
+        parts = [ast.Import(names=[alias]) for alias in node.names]
+    else:
+        parts = [ast.ImportFrom(module=node.module, names=[alias], level=node.level) for alias in node.names]
+    for part in parts:
+        alias = part.names[0]
+        name = (part.module if isinstance(part, ast.ImportFrom) else alias.name) or ""
+        if skip_ui and name.split(".")[0] in UI_ONLY_MODULES:
+            ns[alias.asname or alias.name.split(".")[0]] = None
+            continue
+        try:
+            exec(compile(ast.fix_missing_locations(ast.Module([part], type_ignores=[])), path, "exec"), ns)
+        except ImportError as e:
+            if (e.name or "").split(".")[0] not in UI_ONLY_MODULES:
+                raise
+            ns[alias.asname or alias.name.split(".")[0]] = None
+
+
+def _is_constant(node):
+    names = [n for target in node.targets for n in ast.walk(target) if isinstance(n, ast.Name)]
+    return bool(names) and all(n.id.isupper() for n in names)
+
+
+@functools.lru_cache(maxsize=None)
+def load_app(path, skip_ui=False):
+    """Namespace of the app script at ``path`` with its imports, functions, classes and constants, but no UI."""
+    path = os.path.abspath(path)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    ns = {"__name__": f"headless_{name}", "__file__": path}
+    root = os.path.dirname(path)
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            _bind_import(node, ns, path, skip_ui)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)) or (isinstance(node, ast.Assign) and _is_constant(node)):
+            exec(compile(ast.Module([node], type_ignores=[]), path, "exec"), ns)
+    return ns
@@ -3,10 +3,8 @@ from moviepy.editor import *
 from PIL import Image
 import os
 import io
-import requests
-from io import BytesIO
 import numpy as np
-from tempfile import NamedTemporaryFile
+import assets
 
 # Your assets
 LOGO_URL = "https://ik.imagekit.io/ericmwangi/c&h.png?updatedAt=1761860288449"
@@ -14,22 +12,8 @@ WHATSAPP_ICON_URL = "https://ik.imagekit.io/ericmwangi/whatsapp.png?updatedAt=17
 TIKTOK_ICON_URL = "https://ik.imagekit.io/ericmwangi/tiktok.png?updatedAt=1765799624640"
 MUSIC_URL = "https://ik.imagekit.io/ericmwangi/advertising-music-308403.mp3?updatedAt=1764101548797"  # Your track!
 
-@st.cache_data
-def download_image(url):
-    response = requests.get(url)
-    return Image.open(BytesIO(response.content))
-
-@st.cache_data
-def download_music(url):
-    response = requests.get(url)
-    temp_file = NamedTemporaryFile(delete=False, suffix=".mp3")
-    temp_file.write(response.content)
-    temp_file.close()
-    return temp_file.name
-
-logo_img = download_image(LOGO_URL)
-whatsapp_img = download_image(WHATSAPP_ICON_URL)
-tiktok_img = download_image(TIKTOK_ICON_URL)
+# Fetched in the background at startup; the render waits only for whatever is not on disk yet
+assets.preload([LOGO_URL, WHATSAPP_ICON_URL, TIKTOK_ICON_URL, MUSIC_URL])
 
 # App UI
 st.set_page_config(page_title="Car & Homes Hub Ads", layout="centered")
@@ -73,7 +57,7 @@ if st.button("🎬 Generate Ad with Upbeat Music", type="primary"):
                 temp_images.append(temp_images[-1])
 
             # Download music
-            music_path = download_music(MUSIC_URL)
+            music_path = assets.path(MUSIC_URL)
 
             # Video setup
             size = (1080, 1920)
@@ -118,13 +102,13 @@ if st.button("🎬 Generate Ad with Upbeat Music", type="primary"):
             cta_clip = cta_clip.set_position("center").set_start(7).set_duration(3).fadein(0.8)
 
             # Logo
-            logo_clip = ImageClip(np.array(logo_img.convert("RGBA"))).resize(height=120).set_duration(duration)
+            logo_clip = ImageClip(np.array(assets.image(LOGO_URL))).resize(height=120).set_duration(duration)
             logo_clip = logo_clip.set_position(("center", "bottom")).margin(bottom=50, opacity=0).fadein(1)
 
             # Social icons in CTA
-            wa_clip = ImageClip(np.array(whatsapp_img)).resize(width=100).set_duration(3).set_start(7)
+            wa_clip = ImageClip(np.array(assets.image(WHATSAPP_ICON_URL))).resize(width=100).set_duration(3).set_start(7)
             wa_clip = wa_clip.set_position((0.35, 0.85), relative=True)
-            tt_clip = ImageClip(np.array(tiktok_img)).resize(width=100).set_duration(3).set_start(7)
+            tt_clip = ImageClip(np.array(assets.image(TIKTOK_ICON_URL))).resize(width=100).set_duration(3).set_start(7)
             tt_clip = tt_clip.set_position((0.65, 0.85), relative=True)
 
             video = CompositeVideoClip([video, hook, specs_clip, cta_clip, logo_clip, wa_clip, tt_clip], size=size)
@@ -0,0 +1,119 @@
+"""Static layer cache for the frame renderers.
+
+Everything in a template that does not move (gradient, template graphics,
+vignette, placed logo) is built once per (template, resolution) as a NumPy
+buffer. Every frame then starts from a single copy of that buffer instead of
+redrawing it row by row.
+"""
+import numpy as np
+from PIL import Image
+
+from lru import LRUCache
+
+_BASES = LRUCache(max_entries=16)
+
+
+def hex_to_rgb(hex_str):
+    hex_str = hex_str.lstrip('#')
+    return tuple(int(hex_str[i:i+2], 16) for i in (0, 2, 4))
+
+
+def gradient(width, height, top, bottom):
+    """Vertical two-colour gradient as an opaque (H, W, 4) uint8 array."""
+    c1 = np.array(hex_to_rgb(top), dtype=np.float64)
+    c2 = np.array(hex_to_rgb(bottom), dtype=np.float64)
+    ratio = (np.arange(height) / height)[:, None]
+    rows = (c1 + (c2 - c1) * ratio).astype(np.uint8)  # truncates like int()
+
+    base = np.empty((height, width, 4), dtype=np.uint8)
+    base[:, :, :3] = rows[:, None, :]
+    base[:, :, 3] = 255
+    return base
+
+
+def apply_vignette(base, start=0.65, strength=200):
+    """Darken the bottom of ``base`` in place, ramping to ``strength`` alpha at the last row."""
+    height = base.shape[0]
+    y0 = int(height * start)
+    rows = np.arange(y0, height)
+    alpha = (strength * (rows - height * start) / (height * (1 - start))).astype(int) / 255.0
+    keep = (1.0 - alpha)[:, None, None]
+    base[y0:, :, :3] = (base[y0:, :, :3] * keep + 0.5).astype(np.uint8)
+    return base
+
+
+def paste(base, img, xy):
+    """Alpha-composite an RGBA PIL image onto ``base`` in place, clipped to its bounds."""
+    x, y = xy
+    h, w = base.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + img.width, w), min(y + img.height, h)
+    if x0 >= x1 or y0 >= y1:
+        return base
+
+    src = np.asarray(img.convert("RGBA"), dtype=np.float32)[y0 - y:y1 - y, x0 - x:x1 - x]
+    a = src[:, :, 3:] / 255.0
+    dst = base[y0:y1, x0:x1].astype(np.float32)
+    dst[:, :, :3] = src[:, :, :3] * a + dst[:, :, :3] * (1 - a)
+    if base.shape[2] == 4:
+        dst[:, :, 3:] = 255 * a + dst[:, :, 3:] * (1 - a)
+    base[y0:y1, x0:x1] = (dst + 0.5).astype(np.uint8)
+    return base
+
+
+def clip_box(box, clip):
+    """Intersection of two (x0, y0, x1, y1) boxes, or None when they do not overlap."""
+    x0, y0 = max(box[0], clip[0]), max(box[1], clip[1])
+    x1, y1 = min(box[2], clip[2]), min(box[3], clip[3])
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (x0, y0, x1, y1)
+
+
+def blend(base, src, xy, clip=None):
+    """Bit-exact NumPy ``Image.paste(im, xy, im)`` of an (h, w, 4) uint8 ``src`` onto ``base``, in place.
+
+    Only pixels inside ``clip`` (and the base) are touched, so a layer can be
+    repainted piecewise with exactly the pixels a full paste would give.
+    """
+    x, y = xy
+    h, w = base.shape[:2]
+    box = clip_box((x, y, x + src.shape[1], y + src.shape[0]), (0, 0, w, h))
+    if box and clip:
+        box = clip_box(box, clip)
+    if box is None:
+        return base
+    x0, y0, x1, y1 = box
+
+    src = src[y0 - y:y1 - y, x0 - x:x1 - x]
+    region = base[y0:y1, x0:x1]
+    a = src[:, :, 3:].astype(np.uint32)
+    # PIL's BLEND/DIV255: (dst * (255 - a) + src * a) / 255, rounded with shifts
+    v = region.astype(np.uint32) * (255 - a) + src[:, :, :base.shape[2]] * a + 128
+    region[:] = ((v >> 8) + v) >> 8
+    return base
+
+
+def cached_base(key, build, *refs):
+    """Return the static base for ``key``, calling ``build()`` only on first use.
+
+    ``refs`` are objects (e.g. a cached logo image) that the base depends on by
+    identity; they are folded into the key and kept alive with the entry.
+    """
+    full_key = tuple(key) + tuple(id(r) for r in refs)
+    entry = _BASES.get(full_key)
+    if entry is None:
+        base = build()
+        base.flags.writeable = False
+        entry = _BASES.put(full_key, (refs, base))
+    return entry[1]
+
+
+def base_canvas(base):
+    """Fresh, writable PIL canvas initialised from a cached base (one buffer copy)."""
+    mode = "RGBA" if base.shape[2] == 4 else "RGB"
+    return Image.frombytes(mode, (base.shape[1], base.shape[0]), base)
+
+
+def clear():
+    _BASES.clear()
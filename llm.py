@@ -0,0 +1,141 @@
+"""Chat completions for every app over one pooled, keep-alive HTTP client.
+
+The apps used to post each request with a bare ``requests.post`` or build a
+fresh SDK client per run, so every hook, layout, caption and tip paid a new
+TCP and TLS handshake. :func:`client` returns this process's
+:class:`Client` for an API key. It keeps its connections open between calls
+(``ADGEN_LLM_KEEPALIVE`` seconds) and speaks HTTP/2 when ``h2`` is installed.
+Every call gets its own timeout, and :func:`content` is the single place a
+response is parsed.
+
+Call sites whose prompts repeat (tips, content ideas) pass a ``ttl``: the
+reply is then kept in a :class:`disk_cache.DiskCache`
+(``ADGEN_LLM_CACHE_MB``), keyed by a hash of the canonical JSON request,
+so a repeated topic comes back in milliseconds, across restarts. Use
+``refresh=True`` to regenerate, and ``variant`` when one prompt should
+yield several distinct cached replies.
+
+``ADGEN_LLM_BASE_URL`` points the apps at any OpenAI-compatible endpoint
+(Groq by default).
+"""
+import functools
+import json
+import os
+import time
+
+from disk_cache import CACHE_ROOT, DiskCache, digest
+
+BASE_URL = os.environ.get("ADGEN_LLM_BASE_URL", "https://api.groq.com/openai/v1")
+TIMEOUT = float(os.environ.get("ADGEN_LLM_TIMEOUT", "20"))          # seconds per call, unless the call says otherwise
+CONNECT_TIMEOUT = 5.0
+KEEPALIVE = float(os.environ.get("ADGEN_LLM_KEEPALIVE", "60"))      # seconds an idle connection is kept open
+MAX_CONNECTIONS = int(os.environ.get("ADGEN_LLM_CONNECTIONS", "8"))
+RETRIES = 2   # on connection errors, 429 and 5xx, with exponential backoff
+RETRY_STATUS = {429, 500, 502, 503, 504}
+HOUR = 3600
+DAY = 24 * HOUR
+
+RESPONSES = DiskCache(os.path.join(CACHE_ROOT, "llm"),
+                      max_bytes=int(os.environ.get("ADGEN_LLM_CACHE_MB", "32")) * 2**20,
+                      suffix=".json")
+
+
+class LLMError(RuntimeError):
+    """The request failed or the response had no usable content."""
+
+
+def content(data):
+    """The first choice's message text from a chat-completion response (JSON dict or SDK object), or None."""
+    choices = data.get("choices") if isinstance(data, dict) else getattr(data, "choices", None)
+    if not choices:
+        return None
+    choice = choices[0]
+    message = choice.get("message") if isinstance(choice, dict) else getattr(choice, "message", None)
+    if message is None:
+        return None
+    return message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+
+
+def request_key(payload, base_url=BASE_URL, variant=0):
+    """Cache key for a chat ``payload``: model, messages and sampling settings, in canonical JSON."""
+    return digest("llm", base_url, json.dumps(payload, sort_keys=True, separators=(",", ":")), variant)
+
+
+class Client:
+    """Chat completions against ``base_url`` with ``api_key``, over a pooled ``httpx.Client``."""
+
+    def __init__(self, api_key, base_url=BASE_URL, timeout=TIMEOUT):
+        import httpx
+        self.base_url = base_url
+        try:
+            import h2  # noqa: F401  (httpx's optional HTTP/2 support)
+            http2 = True
+        except ImportError:
+            http2 = False
+        self.timeout = timeout
+        self._http = httpx.Client(
+            base_url=base_url.rstrip("/") + "/",
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+            # The pool lives in the transport: connection limits and keep-alive are set there
+            transport=httpx.HTTPTransport(
+                http2=http2, retries=RETRIES,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS,
+                                    keepalive_expiry=KEEPALIVE)),
+        )
+
+    def chat(self, payload, timeout=None, ttl=0, refresh=False, variant=0):
+        """POST a chat-completion ``payload`` (the OpenAI JSON body) and return the reply text.
+
+        With a ``ttl`` (seconds), a reply cached for the same request within
+        ``ttl`` is returned without a call, unless ``refresh``. Raises
+        :class:`LLMError` on HTTP errors, timeouts and replies without content.
+        """
+        if not ttl:
+            return self._post(payload, timeout)
+        key = request_key(payload, self.base_url, variant)
+        entry = None if refresh else RESPONSES.get(key)
+        if entry is not None:
+            try:
+                entry = json.loads(entry)
+                if time.time() - entry["created"] < ttl:
+                    return entry["content"]
+            except (ValueError, KeyError, TypeError):
+                pass   # a damaged entry is replaced below
+        text = self._post(payload, timeout)
+        RESPONSES.put(key, json.dumps({"created": time.time(), "model": payload.get("model"),
+                                       "content": text}).encode())
+        return text
+
+    def _post(self, payload, timeout=None):
+        import httpx
+        timeout = httpx.Timeout(timeout or self.timeout, connect=CONNECT_TIMEOUT)
+        for attempt in range(RETRIES + 1):
+            try:
+                r = self._http.post("chat/completions", json=payload, timeout=timeout)
+                if r.status_code in RETRY_STATUS and attempt < RETRIES:
+                    wait = r.headers.get("Retry-After", "")
+                    time.sleep(min(10.0, float(wait)) if wait.isdigit() else 0.5 * 2 ** attempt)
+                    continue
+                r.raise_for_status()
+                text = content(r.json())
+            except (httpx.HTTPError, ValueError) as e:
+                raise LLMError(str(e)) from e
+            if text is None:
+                raise LLMError("response has no message content")
+            return text
+
+    def complete(self, messages, model, timeout=None, ttl=0, refresh=False, variant=0, **params):
+        """:meth:`chat` for ``messages`` (a list of role/content dicts, or one user prompt string)."""
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        return self.chat({"model": model, "messages": messages, **params}, timeout, ttl, refresh, variant)
+
+    def close(self):
+        self._http.close()
+
+
+@functools.lru_cache(maxsize=None)
+def client(api_key, base_url=BASE_URL):
+    """This process's shared :class:`Client` for ``api_key``; its connections stay warm between calls."""
+    return Client(api_key, base_url)
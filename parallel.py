@@ -0,0 +1,170 @@
+"""Multi-core frame rendering.
+
+Every frame is a pure function of its timestamp plus static inputs (product
+sprite, fonts, template), so frames are farmed out to a pool of worker
+processes. Workers are started by a ``forkserver`` (``spawn`` where there
+is none), never forked from the app: the Streamlit server is full of
+threads holding locks and of other sessions' open pipes, and a forked child
+would inherit both. A worker is therefore handed an :class:`AppRender`, a
+picklable recipe naming the app script and a factory in it, and builds its
+render function once; after that only frame indices and finished frames
+cross the pipe. Frames come back in order with at most a few per worker in
+flight. With :mod:`timings` on, every frame is timed as the "frame" stage
+and workers, each recording into a :class:`timings.Timings` of its own, send
+their stage timings back along with each frame into the caller's.
+
+With a ``frame_key``, runs of consecutive frames whose keys match are
+rendered once and the same frame object is handed out for the whole run.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from collections import deque
+from typing import NamedTuple
+
+import headless
+import timings
+
+WORKERS_ENV = "RENDER_WORKERS"   # set to 1 to force serial rendering
+IN_FLIGHT_PER_WORKER = 2
+PRELOAD = ["numpy", "PIL.Image", "PIL.ImageDraw", "PIL.ImageFont", "headless", "timings"]   # imported once by the forkserver
+
+_START_LOCK = threading.Lock()
+_SPEC = None     # this worker's AppRender and fps, and the render function built from it
+_RENDER = None
+
+
+class AppRender(NamedTuple):
+    """Picklable recipe for a render function: ``<app>.<factory>(*args)``, with ``<app>`` the script at ``path``.
+
+    The script is loaded with :func:`headless.load_app`, so ``factory`` is a
+    module-level function of the app and ``args`` must pickle. Apps pass
+    their own ``__file__``.
+    """
+    path: str
+    factory: str
+    args: tuple = ()
+
+    def build(self):
+        return headless.load_app(self.path, skip_ui=True)[self.factory](*self.args)
+
+
+def default_workers():
+    """Worker count from ``RENDER_WORKERS``, else every core this process may use."""
+    env = os.environ.get(WORKERS_ENV)
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _render_one(render, t):
+    with timings.stage("frame"):
+        return render(t)
+
+
+def _init_worker(spec, fps, timed):
+    global _SPEC
+    _SPEC = (spec, fps)
+    timings.enable(timed)   # empty stats of the worker's own, on when the caller's render is timed
+
+
+def _render_index(i):
+    global _RENDER
+    spec, fps = _SPEC
+    if _RENDER is None:   # built by the first task, so a failing factory reaches the caller
+        _RENDER = spec.build()
+    frame = _render_one(_RENDER, i / fps)
+    return (frame, timings.collect()) if timings.enabled() else frame
+
+
+def _context():
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" not in methods:
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD)
+    return ctx
+
+
+def _start_pool(spec, fps, workers):
+    """A pool of fresh worker processes for ``spec``.
+
+    Streamlit runs the app as a synthetic ``__main__`` module whose
+    ``__file__`` is the script, and spawned workers re-run ``__main__`` by
+    path before they do anything else, which would run the whole page in
+    each of them. While the workers start, ``__main__`` is an empty module:
+    they only need :mod:`parallel`, and ``spec`` says where the app is.
+    """
+    ctx = _context()
+    with _START_LOCK:
+        main = sys.modules.get("__main__")
+        placeholder = sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            return ctx.Pool(workers, initializer=_init_worker, initargs=(spec, fps, timings.enabled()))
+        finally:
+            if sys.modules.get("__main__") is placeholder:   # unless a script run replaced it meanwhile
+                sys.modules["__main__"] = main
+
+
+def render_frames(render, n_frames, fps, workers=None, progress=None, frame_key=None):
+    """Yield ``render(i / fps)`` for ``i in range(n_frames)``, in order.
+
+    ``render`` is an :class:`AppRender`, rendered in worker processes, or
+    any callable, rendered in this process (as is everything with one worker).
+    ``progress(done, total)`` is called after each frame. ``frame_key(t)`` is
+    an optional cheap, hashable summary of the frame at ``t``, evaluated here:
+    while it stays equal the previous frame is held instead of re-rendered.
+    """
+    keys = [frame_key(i / fps) for i in range(n_frames)] if frame_key else None
+    fresh = [i for i in range(n_frames) if not keys or i == 0 or keys[i] != keys[i - 1]]
+    rendered = _render_indices(render, fresh, fps, workers)
+    try:
+        frame = None
+        pos = 0
+        for i in range(n_frames):
+            if pos < len(fresh) and fresh[pos] == i:
+                frame = next(rendered)
+                pos += 1
+            if progress:
+                progress(i + 1, n_frames)
+            yield frame
+    finally:
+        rendered.close()
+
+
+def _render_indices(render, indices, fps, workers):
+    workers = min(workers or default_workers(), len(indices))
+    if workers <= 1 or not isinstance(render, AppRender):
+        if isinstance(render, AppRender):
+            render = render.build()
+        for i in indices:
+            yield _render_one(render, i / fps)
+        return
+
+    pool = _start_pool(render, fps, workers)
+    try:
+        pending = deque()
+        queued = iter(indices)
+        window = workers * IN_FLIGHT_PER_WORKER
+        for _ in indices:
+            for i in queued:
+                pending.append(pool.apply_async(_render_index, (i,)))
+                if len(pending) >= window:
+                    break
+            result = pending.popleft().get()
+            if timings.enabled():
+                result, stats = result
+                timings.merge(stats)
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -1,6 +1,6 @@
 import streamlit as st
 import requests
-from groq import Groq
+import llm
 import os
 import re
 from dateutil import parser
@@ -11,7 +11,7 @@ import json
 # CONFIG
 # ----------------------------
 GROQ_KEY = st.secrets.get("groq_key", "")
-client = Groq(api_key=GROQ_KEY) if GROQ_KEY else None
+client = llm.client(GROQ_KEY) if GROQ_KEY else None
 MODEL = "llama3-1b-8192"
 
 BRAND_MAROON = "#8B0000"
@@ -239,14 +239,8 @@ if "search_results" in st.session_state:
             with st.spinner("🧠 Generating AI posts (cached for 2h)..."):
                 prompt = build_groq_prompt(phone_data, persona, tone)
                 try:
-                    chat = client.chat.completions.create(
-                        model=MODEL,
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.85,
-                        max_tokens=550,
-                        timeout=30
-                    )
-                    ad_copy = chat.choices[0].message.content.strip()
+                    ad_copy = client.complete(prompt, model=MODEL, temperature=0.85, max_tokens=550,
+                                              timeout=30).strip()
                     st.session_state["social_copy"] = ad_copy
                 except Exception as e:
                     st.session_state["social_copy"] = f"❌ Groq error: {str(e)}"
@@ -0,0 +1,272 @@
+"""Background removal shared by the apps: a warm session pool and a persistent cut-out cache.
+
+A :data:`PROFILES` entry picks the speed/quality trade-off: the rembg model
+and the largest image side it sees (``ADGEN_SEGMENT_PROFILE`` sets the
+default). ``python bench_segmentation.py`` compares the profiles' latency and
+mask IoU on sample photos.
+
+Loading an ONNX model takes seconds, so each process keeps one
+:class:`SessionPool` per profile (see :func:`shared_pool`). The pool loads the
+model once, warms it with a dummy inference in a background thread as soon as
+an app starts, and hands out up to ``ADGEN_REMBG_SESSIONS`` sessions to
+concurrent users, with onnxruntime's thread counts and graph optimizations set
+explicitly. Set ``ADGEN_REMBG_MODEL_PATH`` to an ``.onnx`` file to load a
+u2net-style model from a local path instead of rembg's model directory
+(``U2NET_HOME``).
+
+:func:`remove_background` keeps latency independent of upload size: the
+model only ever sees a bounded downscale, and its mask is upsampled with a
+fast guided filter steered by the full-resolution photo, so edges follow the
+real image instead of the blocky low-res mask.
+
+Even warm, segmentation takes seconds per photo, and the apps ask for it on
+every Generate click even when only the price or template changed. Finished
+cut-outs are stored as RGBA PNGs in a :class:`disk_cache.DiskCache`, keyed by
+the input pixels, the profile and the app's enhancement settings, so the same
+product photo is segmented once per machine rather than once per render.
+"""
+import functools
+import io
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from disk_cache import CACHE_ROOT, DiskCache, digest
+
+PROFILES = {
+    # rembg model, and the longest image side it is run on (0 for full resolution)
+    "quality": {"model": "u2net", "max_side": 1024},
+    "balanced": {"model": "silueta", "max_side": 1024},   # u2net pruned to 43 MB
+    "fast": {"model": "u2netp", "max_side": 640},          # 4.7 MB, coarser edges
+}
+PROFILE = os.environ.get("ADGEN_SEGMENT_PROFILE", "quality")
+MODEL_PATH = os.environ.get("ADGEN_REMBG_MODEL_PATH") or None
+POOL_SIZE = max(1, int(os.environ.get("ADGEN_REMBG_SESSIONS", "1")))
+INTRA_THREADS = int(os.environ.get("ADGEN_ORT_INTRA_THREADS", "0"))   # 0: the CPUs split between pooled sessions
+INTER_THREADS = int(os.environ.get("ADGEN_ORT_INTER_THREADS", "1"))   # the u2net graphs are sequential
+WARM_UP_SIZE = (64, 64)
+GUIDE_RADIUS = 4     # guided-filter window radius, in low-res pixels
+GUIDE_EPS = 1e-3     # guided-filter smoothing; smaller follows image edges more closely
+GUIDE_TILE = 32      # low-res tile size for applying the filter only around mask edges
+
+CUTOUTS = DiskCache(os.path.join(CACHE_ROOT, "cutouts"),
+                    max_bytes=int(os.environ.get("ADGEN_CUTOUT_CACHE_MB", "512")) * 2**20,
+                    suffix=".png")
+
+
+class SessionPool:
+    """Up to ``size`` rembg sessions of one model, created on demand and reused.
+
+    Each session holds its own copy of the model, so only raise ``size`` for
+    concurrent users; a request waits while all sessions are busy.
+    """
+
+    def __init__(self, model="u2net", size=POOL_SIZE, model_path=MODEL_PATH,
+                 intra_threads=INTRA_THREADS, inter_threads=INTER_THREADS):
+        self.model = model
+        self.size = size
+        self.model_path = model_path
+        self.intra_threads = intra_threads or max(1, (os.cpu_count() or 1) // size)
+        self.inter_threads = inter_threads
+        self._idle = queue.LifoQueue()   # the most recently used session has the warmest caches
+        self._created = 0
+        self._lock = threading.Lock()
+        self._warm = None
+
+    @property
+    def name(self):
+        """Model identity for cache keys."""
+        return f"custom:{os.path.abspath(self.model_path)}" if self.model_path else self.model
+
+    def session_options(self):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = self.intra_threads
+        opts.inter_op_num_threads = self.inter_threads
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return opts
+
+    def _new_session(self):
+        # rembg's new_session() builds its own default SessionOptions, so the session class is used directly
+        from rembg.sessions import sessions_class
+        model = "u2net_custom" if self.model_path else self.model
+        cls = next((c for c in sessions_class if c.name() == model), None)
+        if cls is None:
+            raise ValueError(f"unknown rembg model {model!r}")
+        kwargs = {"model_path": self.model_path} if self.model_path else {}
+        return cls(model, self.session_options(), **kwargs)
+
+    @contextmanager
+    def session(self):
+        """Check out a session for the duration of the ``with`` block."""
+        try:
+            sess = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    sess = self._new_session()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                sess = self._idle.get()
+        try:
+            yield sess
+        finally:
+            self._idle.put(sess)
+
+    def remove(self, data, **kwargs):
+        """``rembg.remove(data, **kwargs)`` on a pooled session."""
+        from rembg import remove
+        with self.session() as sess:
+            return remove(data, session=sess, **kwargs)
+
+    def mask(self, image):
+        """The model's "L" foreground mask for a PIL ``image``, at the image's size."""
+        from rembg import remove
+        with self.session() as sess:
+            return remove(image, session=sess, only_mask=True).convert("L")
+
+    def warm_up(self, background=False):
+        """Load the model and run one dummy inference, once; in a daemon thread if ``background``."""
+        with self._lock:
+            if self._warm is None:
+                self._warm = threading.Thread(target=self._warm_up, name="rembg-warm-up", daemon=True)
+                start = True
+            else:
+                start = False
+        if start:
+            self._warm.start()
+        if not background:
+            self._warm.join()
+
+    def _warm_up(self):
+        try:
+            self.mask(Image.new("RGB", WARM_UP_SIZE, (128, 128, 128)))
+        except Exception:
+            pass   # a missing model or runtime surfaces on the first real request instead
+
+
+@functools.lru_cache(maxsize=None)
+def shared_pool(profile=PROFILE):
+    """This process's pool for a :data:`PROFILES` entry, warming up in the background from the first call."""
+    pool = SessionPool(PROFILES[profile]["model"])
+    pool.warm_up(background=True)
+    return pool
+
+
+def _box_mean(x, r):
+    """Mean of ``x`` over (2r+1)^2 windows, shrunk at the borders."""
+    def along(a, axis):
+        n = a.shape[axis]
+        c = np.cumsum(a, axis=axis, dtype=np.float64)
+        c = np.concatenate([np.zeros_like(np.take(c, [0], axis=axis)), c], axis=axis)
+        idx = np.arange(n)
+        hi, lo = np.minimum(idx + r + 1, n), np.maximum(idx - r, 0)
+        shape = [1, 1]
+        shape[axis] = n
+        return (np.take(c, hi, axis=axis) - np.take(c, lo, axis=axis)) / (hi - lo).reshape(shape)
+    return along(along(x, 0), 1).astype(np.float32)
+
+
+def guided_upsample(mask, guide, radius=GUIDE_RADIUS, eps=GUIDE_EPS):
+    """Upsample an "L" ``mask`` to the size of the "L" ``guide`` image, snapping its edges to the guide's.
+
+    Fast guided filter (He & Sun, 2015): the local linear model
+    ``mask ~ a * guide + b`` is fitted at the mask's resolution, and only the
+    smooth ``a`` and ``b`` are upsampled and applied to the full-resolution guide.
+    Away from edges ``a`` is ~0 and the result is just the upsampled ``b``, so
+    the full-resolution arithmetic is only done in tiles where ``a`` is not.
+    """
+    small_guide = np.asarray(guide.resize(mask.size, Image.BILINEAR), np.float32) / 255.0
+    p = np.asarray(mask, np.float32) / 255.0
+    mean_i, mean_p = _box_mean(small_guide, radius), _box_mean(p, radius)
+    var_i = _box_mean(small_guide * small_guide, radius) - mean_i * mean_i
+    cov_ip = _box_mean(small_guide * p, radius) - mean_i * mean_p
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    a, b = _box_mean(a, radius), _box_mean(b, radius)
+
+    w, h = mask.size
+    W, H = guide.size
+    b_8bit = Image.fromarray(np.clip(b * 255.0 + 0.5, 0, 255).astype(np.uint8), "L")
+    out = np.array(b_8bit.resize((W, H), Image.BILINEAR))
+    a_img, b_img = Image.fromarray(a, "F"), Image.fromarray(b, "F")
+    edges = np.abs(a) > 1.0 / 512   # below this a * guide moves the output by under half a level
+    for y0 in range(0, h, GUIDE_TILE):
+        for x0 in range(0, w, GUIDE_TILE):
+            # One low-res pixel of margin, as bilinear upsampling reads its neighbours
+            if not edges[max(0, y0 - 1):y0 + GUIDE_TILE + 1, max(0, x0 - 1):x0 + GUIDE_TILE + 1].any():
+                continue
+            X0, Y0 = x0 * W // w, y0 * H // h
+            X1, Y1 = min(x0 + GUIDE_TILE, w) * W // w, min(y0 + GUIDE_TILE, h) * H // h
+            # Resampling a box of the low-res plane lands on the same grid as resizing all of it
+            box = (X0 * w / W, Y0 * h / H, X1 * w / W, Y1 * h / H)
+            size = (X1 - X0, Y1 - Y0)
+            full = np.asarray(guide.crop((X0, Y0, X1, Y1)), np.float32) / 255.0
+            q = (np.asarray(a_img.resize(size, Image.BILINEAR, box=box)) * full
+                 + np.asarray(b_img.resize(size, Image.BILINEAR, box=box)))
+            out[Y0:Y1, X0:X1] = np.clip(q * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(out, "L")
+
+
+def remove_background(image, profile=PROFILE, pool=None):
+    """RGBA cut-out of a PIL ``image``, segmented on a downscale no larger than the profile's ``max_side``.
+
+    The full-resolution pixels are kept; only the mask comes from the
+    downscale. Like ``rembg.remove``, pixels outside the mask become
+    transparent black.
+    """
+    pool = pool or shared_pool(profile)
+    max_side = PROFILES[profile]["max_side"]
+    rgb = image.convert("RGB")
+    if max_side and max(rgb.size) > max_side:
+        scale = max_side / max(rgb.size)
+        size = (max(1, round(rgb.width * scale)), max(1, round(rgb.height * scale)))
+        small = rgb.reduce(max(1, int(1 / scale))).resize(size, Image.BILINEAR)
+        mask = guided_upsample(pool.mask(small), rgb.convert("L"))
+    else:
+        mask = pool.mask(rgb)
+    cutout = Image.composite(rgb, Image.new("RGB", rgb.size), mask)
+    cutout.putalpha(mask)
+    return cutout
+
+
+def signature(profile=PROFILE):
+    """Identity of :func:`remove_background`'s output for cache keys: model and segmentation size."""
+    return f"{shared_pool(profile).name}@{PROFILES[profile]['max_side'] or 'full'}"
+
+
+def cutout_key(image, model, settings=None):
+    """Cache key for ``image`` segmented with ``model`` and finished with ``settings``."""
+    return digest("cutout", image.mode, image.size, image.tobytes(), model, sorted((settings or {}).items()))
+
+
+def cached_cutout(image, process, model, settings=None):
+    """``process(image)`` as an RGBA image, read from the cut-out cache when this exact input was seen before.
+
+    ``model`` and ``settings`` must describe everything ``process`` does to
+    the pixels; change either and the old entries are simply never hit again.
+    """
+    key = cutout_key(image, model, settings)
+    data = CUTOUTS.get(key)
+    if data is not None:
+        try:
+            return Image.open(io.BytesIO(data)).convert("RGBA")
+        except OSError:
+            pass   # a damaged entry is rebuilt and overwritten below
+    result = process(image).convert("RGBA")
+    buf = io.BytesIO()
+    result.save(buf, format="PNG", compress_level=1)
+    CUTOUTS.put(key, buf.getvalue())
+    return result
@@ -1,17 +1,22 @@
 import streamlit as st
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
-import io
 import tempfile
 import os
 import math
-import requests
 import json
 import re
 import gc
 import time
-from moviepy.editor import ImageSequenceClip
-import groq
+import functools
+import llm
+import glyph_atlas
+import text_layout
+import parallel
+import encoder
+import draft
+import timings
+import assets
 
 # =============================
 # CONFIGURATION
@@ -29,6 +34,7 @@ TEXT_WHITE = "#F8F4E9"
 LOGO_URL = "https://ik.imagekit.io/ericmwangi/smlogo.png?updatedAt=1763071173037"
 AUDIO_URL = "https://ik.imagekit.io/ericmwangi/advertising-music-308403.mp3?updatedAt=1764101548797"
 FONT_URL = "https://github.com/google/fonts/raw/main/ofl/josefinsans/JosefinSans-Bold.ttf"
+assets.preload([LOGO_URL, FONT_URL])
 
 TEMPLATE_ANIMATIONS = {
     "Diagonal Stripes": "typewriter",
@@ -37,23 +43,12 @@ TEMPLATE_ANIMATIONS = {
     "Modern Grid": "highlight"
 }
 
-@st.cache_resource
-def load_font():
+@functools.lru_cache(maxsize=32)
+def get_font(size):
     try:
-        resp = requests.get(FONT_URL, timeout=10)
-        if resp.status_code == 200:
-            return io.BytesIO(resp.content)
+        return assets.font(FONT_URL, size)
     except:
         pass
-    return None
-
-def get_font(size):
-    font_io = load_font()
-    if font_io:
-        try:
-            return ImageFont.truetype(font_io, size)
-        except:
-            pass
     for name in ["Arial Bold.ttf", "arialbd.ttf", "Arial-BoldMT", "Helvetica-Bold"]:
         try:
             return ImageFont.truetype(name, size)
@@ -66,17 +61,15 @@ def get_groq_client():
     if 'groq_key' not in st.secrets:
         st.error("❌ Add 'groq_key' to Streamlit Secrets")
         return None
-    return groq.Client(api_key=st.secrets['groq_key'])
+    return llm.client(st.secrets['groq_key'])
 
 @st.cache_resource
 def load_logo():
     try:
-        resp = requests.get(LOGO_URL, timeout=10)
-        if resp.status_code == 200:
-            logo = Image.open(io.BytesIO(resp.content)).convert("RGBA")
-            ratio = min(280 / logo.width, 140 / logo.height)
-            new_size = (int(logo.width * ratio), int(logo.height * ratio))
-            return logo.resize(new_size, Image.LANCZOS)
+        logo = assets.image(LOGO_URL)
+        ratio = min(280 / logo.width, 140 / logo.height)
+        new_size = (int(logo.width * ratio), int(logo.height * ratio))
+        return logo.resize(new_size, Image.LANCZOS)
     except:
         pass
     fallback = Image.new("RGBA", (280, 140), (0,0,0,0))
@@ -85,7 +78,7 @@ def load_logo():
     draw.text((20, 25), "SM", fill=ACCENT_GOLD, font=font)
     return fallback
 
-def generate_diy_content_with_retry(client, topic, max_retries=3):
+def generate_diy_content_with_retry(client, topic, max_retries=3, refresh=False):
     for attempt in range(max_retries):
         try:
             prompt = f"""
@@ -105,13 +98,9 @@ def generate_diy_content_with_retry(client, topic, max_retries=3):
                 "hashtags": "#DIY #WoodCare #SMInteriors"
             }}
             """
-            chat_completion = client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.1-8b-instant",
-                temperature=0.8,
-                max_tokens=300
-            )
-            resp_text = chat_completion.choices[0].message.content
+            # Cached on disk per topic; a retry means the cached reply was unusable, so it asks again
+            resp_text = client.complete(prompt, model="llama-3.1-8b-instant", temperature=0.8, max_tokens=300,
+                                        ttl=llm.DAY, refresh=refresh or attempt > 0)
             json_match = re.search(r'\{.*\}', resp_text, re.DOTALL)
             if json_match:
                 data = json.loads(json_match.group())
@@ -124,12 +113,11 @@ def generate_diy_content_with_retry(client, topic, max_retries=3):
             time.sleep(0.5 * (2 ** attempt))
     return None
 
-@st.cache_data
-def get_ai_content(topic: str, seed: int):
+def get_ai_content(topic: str, refresh: bool = False):
     client = get_groq_client()
     if not client:
         return None
-    return generate_diy_content_with_retry(client, topic)
+    return generate_diy_content_with_retry(client, topic, refresh=refresh)
 
 # =============================
 # ANIMATED BACKGROUNDS (NEW!)
@@ -238,94 +226,119 @@ def adjust_title_font(title, max_width, max_font_size=90):
 # =============================
 def create_tiktok_frame(t, lines, title, logo, font_title, font_text, template_name):
     # Generate animated background using current time
-    bg_array = create_background(template_name, t)
+    with timings.stage("background"):
+        bg_array = create_background(template_name, t)
     
     overlay = Image.new("RGBA", (WIDTH, HEIGHT), (0, 0, 0, 0))
     draw = ImageDraw.Draw(overlay)
     
     # Logo (larger)
-    if logo:
-        overlay.paste(logo, (70, 60), logo)
+    with timings.stage("logo"):
+        if logo:
+            overlay.paste(logo, (70, 60), logo)
     
     # Title (lowered + animated)
-    title_y = 340
-    title_animation = TEMPLATE_ANIMATIONS.get(template_name, "highlight")
+    with timings.stage("text.title"):
+        title_y = 340
+        title_animation = TEMPLATE_ANIMATIONS.get(template_name, "highlight")
     
-    if title_animation == "typewriter":
-        letters_per_sec = 6
-        visible_chars = int(t * letters_per_sec)
-        displayed_title = title[:visible_chars]
-        draw.text((WIDTH // 2, title_y), displayed_title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
-        if visible_chars >= len(title) and t > 1.0 and int(t * 4) % 2 == 0:
-            cursor_w = font_title.getbbox(displayed_title or " ")[2]
-            cursor_x = WIDTH // 2 + cursor_w // 2 + 5
-            draw.line([(cursor_x, title_y - 40), (cursor_x, title_y + 40)], fill=ACCENT_GOLD, width=2)
+        if title_animation == "typewriter":
+            letters_per_sec = 6
+            visible_chars = int(t * letters_per_sec)
+            displayed_title = title[:visible_chars]
+            # Only newly revealed glyphs are blitted; the prefix stays centred like anchor="mm"
+            line = glyph_atlas.typewriter_line(font_title, title)
+            mask = line.reveal(visible_chars)
+            if line.shown:
+                mid_offset = font_title.getbbox("A", anchor="lm")[1] - font_title.getbbox("A", anchor="la")[1]
+                x = math.ceil(WIDTH // 2 - line.pen(visible_chars) / 2 - 0.5) - line.pad_left
+                y = title_y + mid_offset - line.pad_top
+                overlay.paste(ACCENT_GOLD, (x, y), Image.fromarray(mask))
+            if visible_chars >= len(title) and t > 1.0 and int(t * 4) % 2 == 0:
+                cursor_w = text_layout.text_bbox(displayed_title or " ", font_title)[2]
+                cursor_x = WIDTH // 2 + cursor_w // 2 + 5
+                draw.line([(cursor_x, title_y - 40), (cursor_x, title_y + 40)], fill=ACCENT_GOLD, width=2)
 
-    elif title_animation == "fade-in-slide":
-        if t < 0.1:
-            pass
-        elif t < 1.2:
-            progress = min(1.0, (t - 0.1) / 1.1)
-            offset_y = 20 * (1 - progress)
-            draw.text((WIDTH // 2, title_y - offset_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
-        else:
-            draw.text((WIDTH // 2, title_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
+        elif title_animation == "fade-in-slide":
+            if t < 0.1:
+                pass
+            elif t < 1.2:
+                progress = min(1.0, (t - 0.1) / 1.1)
+                offset_y = 20 * (1 - progress)
+                draw.text((WIDTH // 2, title_y - offset_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
+            else:
+                draw.text((WIDTH // 2, title_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
 
-    else:  # "highlight"
-        title_bbox = font_title.getbbox(title)
-        title_w = title_bbox[2] - title_bbox[0]
-        if title_w > WIDTH - 200:
-            title_lines = split_text_dynamic(title, font_title, WIDTH - 200)
-            for i, t_line in enumerate(title_lines):
-                y = 320 + i * 100
-                if y < TEXT_MAX_Y:
-                    draw.text((WIDTH // 2, y), t_line, fill=ACCENT_GOLD, font=font_title, anchor="mm")
-        else:
-            draw.text((WIDTH // 2, title_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
+        else:  # "highlight"
+            title_bbox = font_title.getbbox(title)
+            title_w = title_bbox[2] - title_bbox[0]
+            if title_w > WIDTH - 200:
+                title_lines = split_text_dynamic(title, font_title, WIDTH - 200)
+                for i, t_line in enumerate(title_lines):
+                    y = 320 + i * 100
+                    if y < TEXT_MAX_Y:
+                        draw.text((WIDTH // 2, y), t_line, fill=ACCENT_GOLD, font=font_title, anchor="mm")
+            else:
+                draw.text((WIDTH // 2, title_y), title, fill=ACCENT_GOLD, font=font_title, anchor="mm")
     
     # Animated tip text
-    base_y = 620
-    line_height = 95
-    for line_idx, line in enumerate(lines):
-        y = base_y + line_idx * line_height
-        if y + line_height > TEXT_MAX_Y:
-            break
+    with timings.stage("text.tips"):
+        base_y = 620
+        line_height = 95
+        for line_idx, line in enumerate(lines):
+            y = base_y + line_idx * line_height
+            if y + line_height > TEXT_MAX_Y:
+                break
         
-        words = line.split()
-        if not words:
-            continue
+            words = line.split()
+            if not words:
+                continue
         
-        word_start_time = line_idx * 0.8
-        highlighted = False
-        for word_idx, word in enumerate(words):
-            word_time_start = word_start_time + word_idx * 0.25
-            if word_time_start <= t < word_time_start + 0.25:
-                test_prefix = ' '.join(words[:word_idx])
-                prefix_w = font_text.getbbox(test_prefix + " ")[2] if test_prefix else 0
-                word_w = font_text.getbbox(word)[2]
-                line_w = font_text.getbbox(line)[2]
-                x_start = WIDTH // 2 - line_w // 2 + prefix_w
-                word_bbox = font_text.getbbox(word)
-                draw.rectangle(
-                    [x_start - 4, y + word_bbox[1] - 4, x_start + word_w + 4, y + word_bbox[3] + 4],
-                    fill=ACCENT_GOLD + "30"
-                )
-                draw.text((WIDTH // 2, y), line, fill=TEXT_WHITE, font=font_text, anchor="mm")
-                highlighted = True
-                break
+            word_start_time = line_idx * 0.8
+            highlighted = False
+            for word_idx, word in enumerate(words):
+                word_time_start = word_start_time + word_idx * 0.25
+                if word_time_start <= t < word_time_start + 0.25:
+                    test_prefix = ' '.join(words[:word_idx])
+                    prefix_w = font_text.getbbox(test_prefix + " ")[2] if test_prefix else 0
+                    word_w = font_text.getbbox(word)[2]
+                    line_w = font_text.getbbox(line)[2]
+                    x_start = WIDTH // 2 - line_w // 2 + prefix_w
+                    word_bbox = font_text.getbbox(word)
+                    draw.rectangle(
+                        [x_start - 4, y + word_bbox[1] - 4, x_start + word_w + 4, y + word_bbox[3] + 4],
+                        fill=ACCENT_GOLD + "30"
+                    )
+                    draw.text((WIDTH // 2, y), line, fill=TEXT_WHITE, font=font_text, anchor="mm")
+                    highlighted = True
+                    break
         
-        if not highlighted:
-            draw.text((WIDTH // 2, y), line, fill=TEXT_WHITE, font=font_text, anchor="mm")
+            if not highlighted:
+                draw.text((WIDTH // 2, y), line, fill=TEXT_WHITE, font=font_text, anchor="mm")
     
     # CTA
-    cta_text = "Follow @SMInteriors"
-    draw.text((WIDTH // 2, HEIGHT - 180), cta_text, fill=ACCENT_GOLD, font=get_font(50), anchor="mm")
+    with timings.stage("text.cta"):
+        cta_text = "Follow @SMInteriors"
+        draw.text((WIDTH // 2, HEIGHT - 180), cta_text, fill=ACCENT_GOLD, font=get_font(50), anchor="mm")
     
     # Composite overlay onto background
-    fg = np.array(overlay)[:,:,:3]
-    alpha = np.array(overlay)[:,:,3:] / 255.0
-    frame = (bg_array * (1 - alpha) + fg * alpha).astype(np.uint8)
-    return frame
+    with timings.stage("composite"):
+        fg = np.array(overlay)[:,:,:3]
+        alpha = np.array(overlay)[:,:,3:] / 255.0
+        frame = (bg_array * (1 - alpha) + fg * alpha).astype(np.uint8)
+        return frame
+
+def frame_renderer(lines, title, logo, template_name):
+    """``render(t)`` of the video; render workers build theirs (fonts included) with it."""
+    font_title = adjust_title_font(title, WIDTH - 200)
+    font_text = get_font(64)
+    return lambda t: create_tiktok_frame(t, lines, title, logo, font_title, font_text, template_name)
+
+def show_timings(panel, report_json):
+    """Stage timing breakdown in ``panel``, with the JSON for download."""
+    with panel:
+        st.dataframe(json.loads(report_json)["stages"], use_container_width=True)
+        st.download_button("Download Timings (JSON)", report_json, "render_timings.json", "application/json")
 
 # =============================
 # STREAMLIT APP
@@ -344,11 +357,15 @@ with col2:
     )
 
 duration = st.slider("Duration (seconds)", 4, 8, 6)
+show_render_timings = st.checkbox("⏱️ Show Render Timings", help="Time each render stage and show a breakdown table.")
 
-if st.button("✨ Generate AI Tip", use_container_width=True):
+tip_btn = st.button("✨ Generate AI Tip", use_container_width=True)
+# A topic's tip is cached on disk for a day; Regenerate asks the model for a new one
+regen_btn = st.button("🔄 Regenerate Tip", use_container_width=True)
+if tip_btn or regen_btn:
     with st.spinner("Creating your luxury DIY tip..."):
         try:
-            content = get_ai_content(topic, hash(topic) % 100000)
+            content = get_ai_content(topic, refresh=regen_btn)
             if content:
                 st.session_state.ai_content = content
                 st.session_state.duration = duration
@@ -379,31 +396,64 @@ if 'ai_content' in st.session_state:
     preview_frame = create_tiktok_frame(1.5, lines, edited_title, logo, font_title, font_text, template)
     st.image(preview_frame, width=320)
     
+    # Quick draft first; the full-quality export unlocks once a draft of exactly these inputs was shown
+    job_key = draft.signature(edited_title, edited_tip, template, duration)
+    if st.button("👀 Preview Draft", use_container_width=True):
+        with st.spinner("Rendering a quick draft..."):
+            draft_path = os.path.join(tempfile.gettempdir(), f"sm_reels_draft_{int(time.time())}.mp4")
+            timings.enable(show_render_timings)
+            timings.reset()
+            try:
+                st.session_state.draft_size = draft.render_draft(
+                    parallel.AppRender(__file__, "frame_renderer", (lines, edited_title, logo, template)),
+                    duration, draft_path, WIDTH, HEIGHT)
+                with open(draft_path, "rb") as f:
+                    st.session_state.draft_video = f.read()
+                st.session_state.draft_timings = (timings.to_json(app="simple_factory", mode="draft",
+                                                                  template=template, fps=draft.DRAFT_FPS)
+                                                  if show_render_timings else None)
+                st.session_state.draft_key = job_key
+            except Exception as e:
+                st.error(f"Draft failed: {e}")
+            finally:
+                if os.path.exists(draft_path):
+                    os.remove(draft_path)
+    has_draft = st.session_state.get("draft_key") == job_key
+    if has_draft:
+        st.video(st.session_state.draft_video)
+        w, h = st.session_state.draft_size
+        st.caption(f"Draft: {w}x{h} at {draft.DRAFT_FPS} fps. Approve it to export the full-quality video.")
+        if st.session_state.get("draft_timings"):
+            show_timings(st.expander("⏱️ Draft Render Timings"), st.session_state.draft_timings)
+    
     # Render Video
-    if st.button("🚀 Export Reels Video", type="primary", use_container_width=True):
+    if st.button("🚀 Approve & Export Reels Video", type="primary", use_container_width=True,
+                 disabled=not has_draft, help="Renders the full-quality video once you have checked the draft."):
         if len(edited_tip.split()) > 40:
             st.warning("⚠️ Keep tip under 40 words for best results.")
         else:
             with st.spinner("Rendering... (30-60 sec)"):
                 progress = st.progress(0)
-                frames = []
                 total_frames = FPS * duration
+                timings.enable(show_render_timings)
+                timings.reset()
+                
+                def report(done, total):
+                    if (done - 1) % max(1, total // 30) == 0:
+                        progress.progress(min(1.0, done / total))
                 
-                for i in range(total_frames):
-                    t = i / FPS
-                    frame = create_tiktok_frame(t, lines, edited_title, logo, font_title, font_text, template)
-                    frames.append(frame)
-                    if i % max(1, total_frames // 30) == 0:
-                        progress.progress(min(1.0, (i + 1) / total_frames))
+                frames = parallel.render_frames(
+                    parallel.AppRender(__file__, "frame_renderer", (lines, edited_title, logo, template)),
+                    total_frames, FPS, progress=report)
                 
                 out_path = os.path.join(tempfile.gettempdir(), f"sm_reels_{int(time.time())}.mp4")
                 try:
-                    clip = ImageSequenceClip(frames, fps=FPS)
-                    clip.write_videofile(
-                        out_path, fps=FPS, codec="libx264",
-                        audio_codec="aac", preset="medium",
-                        logger=None, threads=4, ffmpeg_params=["-crf", "23"]
-                    )
+                    # Frames stream straight into ffmpeg as they are rendered
+                    encoder.encode_video(frames, out_path, WIDTH, HEIGHT, FPS,
+                                         preset="medium", crf=23, threads=4)
+                    if show_render_timings:
+                        show_timings(st.expander("⏱️ Render Timings", expanded=True),
+                                     timings.to_json(app="simple_factory", mode="final", template=template, fps=FPS))
                     st.success("✅ Reels video ready!")
                     st.video(out_path)
                     with open(out_path, "rb") as f:
@@ -416,6 +466,5 @@ if 'ai_content' in st.session_state:
                 except Exception as e:
                     st.error(f"Render failed: {e}")
                 finally:
-                    clip.close()
                     del frames
                     gc.collect()
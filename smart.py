@@ -1,9 +1,26 @@
 import streamlit as st
-import io, requests, math, tempfile, base64, json, random, time, os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageOps
+import math, tempfile, json, random, time, os, functools
+from PIL import Image, ImageFont, ImageOps
 import numpy as np
-from moviepy.editor import ImageSequenceClip, AudioFileClip
-from rembg import remove, new_session
+from typing import NamedTuple
+import layers
+from sprites import ProductSprite
+import effects
+import text_layout
+import text_sprites
+import glyph_atlas
+import parallel
+import encoder
+import dirty
+import timeline
+import draft
+import timings
+import segmentation
+import enhance
+import assets
+import llm
+import taskgraph
+import vision
 
 # ================================
 # CONFIG & PAGE SETUP
@@ -21,6 +38,7 @@ MUSIC_TRACKS = {
     "Modern Gold": "https://uppbeat.io/assets/track/mp3/synapse-fire-link-me-up.mp3",
     "Chill Beats": "https://uppbeat.io/assets/track/mp3/ikson-new-world.mp3"
 }
+assets.preload([LOGO_URL, *MUSIC_TRACKS.values()])
 BRAND_PRIMARY = "#4C3B30"
 BRAND_ACCENT = "#D2A544"
 TEMPLATES = {
@@ -37,36 +55,32 @@ TEMPLATES = {
 # -----------------
 # START OMITTED BLOCK
 # -----------------
-HEADERS = {
-    "Authorization": f"Bearer {st.secrets['groq_key']}",
-    "Content-Type": "application/json"
-}
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+GROQ_KEY = st.secrets['groq_key']
 
-@st.cache_resource
-def get_rembg_session():
-    return new_session()
 
 @st.cache_resource
 def get_cached_logo(logo_url, width, height):
     try:
-        r = requests.get(logo_url, timeout=8)
-        r.raise_for_status()
-        return Image.open(io.BytesIO(r.content)).convert("RGBA")
+        return assets.image(logo_url)
     except Exception as e:
         st.warning(f"Failed to load logo from URL. Using transparent placeholder. Error: {e}")
         return Image.new("RGBA", (width, height), (0, 0, 0, 0))
 
-def process_image_pro(input_image):
+PRODUCT_ENHANCE = {"contrast": 1.15, "sharpness": 1.5}
+
+def segment_product(input_image, profile=segmentation.PROFILE):
     with st.spinner("Removing background & enhancing..."):
-        buf = io.BytesIO()
-        input_image.save(buf, format="PNG")
-        output_bytes = remove(buf.getvalue(), session=get_rembg_session())
-        img = Image.open(io.BytesIO(output_bytes)).convert("RGBA")
-        img = ImageEnhance.Contrast(img).enhance(1.15)
-        img = ImageEnhance.Sharpness(img).enhance(1.5)
+        # Segmented on a bounded downscale; the mask is upsampled onto the full-resolution photo
+        img = segmentation.remove_background(input_image, profile)
+        # One fused pass, identical to the ImageEnhance Contrast -> Sharpness chain
+        img = enhance.enhance(img, **PRODUCT_ENHANCE)
     return img
 
+def process_image_pro(input_image, profile=segmentation.PROFILE):
+    # The same photo is only segmented once per profile; cut-outs persist on disk across restarts
+    return segmentation.cached_cutout(input_image, lambda img: segment_product(img, profile),
+                                      segmentation.signature(profile), PRODUCT_ENHANCE)
+
 @st.cache_resource
 def get_font_path(font_name):
     if font_name == "Serif":
@@ -81,6 +95,7 @@ def get_font_path(font_name):
             return path
     return None 
 
+@functools.lru_cache(maxsize=64)
 def get_font(size, font_type="Sans-Serif-Bold"):
     path = get_font_path(font_type)
     try:
@@ -91,85 +106,57 @@ def get_font(size, font_type="Sans-Serif-Bold"):
     except:
         return ImageFont.load_default()
 
-def ease_out_elastic(t):
-    if t <= 0: return 0
-    if t >= 1: return 1
-    c4 = (2 * math.pi) / 3
-    return math.pow(2, -10 * t) * math.sin((t * 10 - 0.75) * c4) + 1
-
-def linear_fade(t, start, duration):
-    if t < start: return 0.0
-    if t > start + duration: return 1.0
-    return (t - start) / duration
-
 def hex_to_rgb(hex_str):
     hex_str = hex_str.lstrip('#')
     return tuple(int(hex_str[i:i+2], 16) for i in (0,2,4))
 
 def draw_centered_text(draw, text, y, font, color, max_width=600, alpha=255):
-    lines = []
-    words = text.split()
-    line = ""
-    
-    for w in words:
-        test = line + (" " + w if line else w)
-        mask = ImageDraw.Draw(Image.new("L", (1, 1))).textmask((0,0), test, font=font)
-        test_width = mask.getbbox()[2] if mask.getbbox() else 0
-        
-        if test_width <= max_width:
-            line = test
-        else:
-            lines.append(line)
-            line = w
-    if line: lines.append(line)
-    
-    current_y = y
+    layout = text_layout.layout_text(text, font, max_width)
     fill_color = (*hex_to_rgb(color), alpha)
-    
-    for line in lines:
-        w, h = draw.textbbox((0,0), line, font=font)[2], draw.textbbox((0,0), line, font=font)[3]
-        draw.text(((WIDTH - w) // 2, current_y), line, font=font, fill=fill_color)
-        current_y += h + 8
-    return current_y
+    return text_layout.draw_layout(draw, layout, y, font, fill_color, WIDTH)
 
-def ask_groq(payload):
+def ask_groq(payload, ttl=0, refresh=False):
+    """The reply to ``payload``; with a ``ttl``, a reply cached on disk for the same request is reused."""
     try:
-        full_url = f"{GROQ_BASE_URL}/chat/completions"
-        r = requests.post(full_url, json=payload, headers=HEADERS, timeout=12)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+        # Shared keep-alive client: only the first call of the process pays the TCP and TLS handshake
+        return llm.client(GROQ_KEY).chat(payload, timeout=12, ttl=ttl, refresh=refresh)
     except Exception as e:
         st.error(f"Groq API Error: {e}")
         return None
 
-def get_data_groq(img, model_name):
-    
-    FIXED_LAYOUT_MAP = {
-        "LOGO_TOP":         {"x": 50, "y": 50, "w": 200, "h": 100},
-        "PRODUCT_CENTER":   {"x": 60, "y": 250, "w": 600, "h": 600},
-        "CAPTION_HEADLINE": {"x": 50, "y": 200, "w": 620, "h": 120}, 
-        "PRICE_BUTTON":     {"x": (WIDTH - 400) // 2, "y": 1050, "w": 400, "h": 120},
-        "CONTACT_FOOTER":   {"x": 60, "y": 1200, "w": 600, "h": 60},
-    }
+FIXED_LAYOUT_MAP = {
+    "LOGO_TOP":         {"x": 50, "y": 50, "w": 200, "h": 100},
+    "PRODUCT_CENTER":   {"x": 60, "y": 250, "w": 600, "h": 600},
+    "CAPTION_HEADLINE": {"x": 50, "y": 200, "w": 620, "h": 120}, 
+    "PRICE_BUTTON":     {"x": (WIDTH - 400) // 2, "y": 1050, "w": 400, "h": 120},
+    "CONTACT_FOOTER":   {"x": 60, "y": 1200, "w": 600, "h": 60},
+}
 
-    if img:
-        buf = io.BytesIO()
-        rgb = img.convert("RGB") if img.mode == "RGBA" else img
-        rgb.save(buf, format="JPEG", quality=90)
-        b64 = base64.b64encode(buf.getvalue()).decode()
-        
+def get_hook_groq(img, model_name):
+    """Vision hook for the product photo ``img`` (a default without one)."""
+    if not img:
+        return "Redefine Your Living Space"
+    hook_model = "llama-3.2-11b-vision-preview"
+    hook_prompt = f"Write a 4–6 word high-impact hook for this {model_name} ad. Focus on aspirational words."
+
+    def ask_hook():
         hook_payload = {
-            "model": "llama-3.2-11b-vision-preview",
+            "model": hook_model,
             "messages": [{"role": "user", "content": [
-                {"type": "text", "text": f"Write a 4–6 word high-impact hook for this {model_name} ad. Focus on aspirational words."},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}}
+                {"type": "text", "text": hook_prompt},
+                # A bounded thumbnail of the product, not the full-resolution cut-out
+                {"type": "image_url", "image_url": {"url": vision.data_url(img)}}
             ]}],
             "max_tokens": 30
         }
-        hook = ask_groq(hook_payload) or "Redefine Your Living Space" 
-    else:
-        hook = "Redefine Your Living Space"
+        return ask_groq(hook_payload)
+
+    # Re-uploads and near-identical shots of the product reuse its earlier hook without a request
+    hook = vision.cached_reply(img, (hook_model, hook_prompt), ask_hook, ttl=7 * llm.DAY)
+    return (hook or "Redefine Your Living Space").strip('"')
 
+def get_layout_groq(model_name):
+    """Layout boxes for the ad; text-only, so it never waits for the product photo."""
     block_names = [k for k in FIXED_LAYOUT_MAP.keys()] 
     
     layout_payload = {
@@ -182,7 +169,6 @@ def get_data_groq(img, model_name):
         "temperature": 0.5
     }
     layout_raw = ask_groq(layout_payload)
-    final_hook = hook.strip('"')
 
     default_mapping = {
         'logo': 'LOGO_TOP', 'product': 'PRODUCT_CENTER', 'caption': 'CAPTION_HEADLINE', 
@@ -201,16 +187,16 @@ def get_data_groq(img, model_name):
                 final_boxes.append(box_data)
         
         if not final_boxes:
-             return final_hook, [FIXED_LAYOUT_MAP[role] | {'role': role} for role in default_mapping.values()]
+             return [FIXED_LAYOUT_MAP[role] | {'role': role} for role in default_mapping.values()]
 
-        return final_hook, final_boxes
+        return final_boxes
             
     except Exception as e:
         # st.warning(f"AI creative mapping failed, using default layout. Error: {e}")
-        return final_hook, [FIXED_LAYOUT_MAP[block_name].copy() | {'role': role} for role, block_name in default_mapping.items()]
+        return [FIXED_LAYOUT_MAP[block_name].copy() | {'role': role} for role, block_name in default_mapping.items()]
 
 
-def generate_tips(content_type, keyword):
+def generate_tips(content_type, keyword, refresh=False):
     system = "You are a luxury furniture brand content expert. Reply ONLY with markdown bullet points, no intro/outro. Use very concise language suitable for quick on-screen text."
     prompts = {
         "DIY Tips": f"5 quick DIY decor ideas using common items, focused on '{keyword}'",
@@ -228,7 +214,7 @@ def generate_tips(content_type, keyword):
         "max_tokens": 800
     }
     with st.spinner("Generating tips..."):
-        result = ask_groq(payload)
+        result = ask_groq(payload, ttl=llm.DAY, refresh=refresh)
         return result or '5 Secrets to a Luxe Home\n* Tip one\n* Tip two\n* Tip three\n* Tip four\n* Tip five'
 
 # -----------------
@@ -238,224 +224,216 @@ def generate_tips(content_type, keyword):
 # ================================
 # FRAME RENDERER (ALL LOGIC HERE)
 # ================================
-def create_frame(t, img, boxes, texts, tpl_name, logo_img, content_type, animation_style):
-    # DURATION is assumed to be globally set before this function is called
-    
+def build_static_base(tpl_name, logo_img, logo_box):
+    """Everything that never moves in a template, as an RGBA array."""
     T = TEMPLATES[tpl_name]
-    canvas = Image.new("RGBA", (WIDTH, HEIGHT))
-    draw = ImageDraw.Draw(canvas)
-
-    # --- FONT DEFINITIONS ---
-    HEADLINE_FONT = get_font(60, "Sans-Serif-Bold") 
-    TIP_FONT = get_font(42, "Serif")              
-    CONTACT_FONT = get_font(32, "Sans-Serif-Bold") 
-
-    # Background Gradient (UNCHANGED)
-    c1 = hex_to_rgb(T["bg_grad"][0])
-    c2 = hex_to_rgb(T["bg_grad"][1])
-    for y in range(HEIGHT):
-        ratio = y / HEIGHT
-        color = tuple(int(c1[i] + (c2[i] - c1[i]) * ratio) for i in range(3))
-        draw.line([(0,y), (WIDTH,y)], fill=color)
+    with timings.stage("base.gradient"):
+        base = layers.gradient(WIDTH, HEIGHT, T["bg_grad"][0], T["bg_grad"][1])
 
     # Template Graphics (UNCHANGED)
     # ...
 
-    # Draw Product & Shadow (Layer 1)
-    product_box = next((b for b in boxes if b["role"] == "product"), None)
-    
-    if product_box and img: 
-        b = product_box
-        
-        # Adjust product position for Content Video (Smaller)
-        if content_type == "Content Video": 
-            b["y"] = 250
-            b["h"] = 400
-        
-        # Scale and placement logic (UNCHANGED)
-        scale = ease_out_elastic(min(t * 1.5, 1.0)) 
-        if scale > 0.02:
-            pw, ph = int(b["w"]*scale), int(b["h"]*scale)
-            prod = img.resize((pw, ph), Image.LANCZOS)
-            
-            # Shadow
-            shadow = prod.copy().convert("L")
-            shadow = shadow.point(lambda p: p * 0.3)
-            shadow = shadow.convert("RGBA")
-            shadow = shadow.filter(ImageFilter.GaussianBlur(20))
-            
-            canvas.paste(shadow, 
-                         (int(b["x"]+(b["w"]-pw)//2+10), int(b["y"]+(b["h"]-ph)//2+40)), 
-                         shadow)
-
-            # Product Placement
-            prod_mask = prod.getchannel('A')
-            canvas.paste(prod, 
-                         (int(b["x"]+(b["w"]-pw)//2), 
-                          int(b["y"]+(b["h"]-ph)//2 + math.sin(t*3)*10)), 
-                         prod_mask)
-
-    # --- BLOCK 2: Draw Text Elements ---
-    
-    # 2a. Draw Contact/URL
-    contact_box = next((b for b in boxes if b["role"] == "contact"), None)
-    if contact_box:
-        alpha = int(255 * linear_fade(t, DURATION - 1.5, 0.5))
-        y_start = contact_box.get('y', 1200)
-        if alpha > 0:
-            draw_centered_text(draw, texts["contact"], y_start, CONTACT_FONT, T["text"], max_width=600, alpha=alpha)
-        
-    # 2b. Draw Caption/Hook (Title) 
-    caption_box = next((b for b in boxes if b["role"] == "caption"), None)
-    if caption_box:
-        
-        if content_type == "Product Showcase":
-            alpha = int(255 * linear_fade(t, 1.0, 0.5)) 
-        elif content_type == "Content Video":
-            alpha_in = linear_fade(t, 0.5, 1.0) 
-            alpha_out = 1.0 - linear_fade(t, 2.5, 1.0)
-            alpha = int(255 * max(0, min(alpha_in, alpha_out)))
-
-        if alpha > 0:
-            draw_centered_text(draw, texts["caption"], caption_box.get('y', 150), 
-                            HEADLINE_FONT, T["accent"], max_width=600, alpha=alpha)
-
-
-    # 2c. Draw Price (Product Showcase ONLY)
-    if content_type == "Product Showcase":
-        price_box = next((b for b in boxes if b["role"] == "price"), None)
-        if price_box and t > 1.4:
-            PRICE_X, PRICE_Y_START, PRICE_W, PRICE_H = price_box["x"], price_box["y"], price_box["w"], price_box["h"]
-            
-            alpha = int(255 * linear_fade(t, 1.4, 0.5))
-            
-            # Button logic (Simplified for space)
-            fill_color = (*hex_to_rgb(T["price_bg"]), alpha)
-            draw.rounded_rectangle([PRICE_X, PRICE_Y_START, PRICE_X + PRICE_W, PRICE_Y_START + PRICE_H], 
-                                    radius=30, fill=fill_color)
-            price_font = get_font(68)
-            price_text_bbox_h = draw.textbbox((0,0), texts["price"].split('\n')[0], font=price_font)[3] 
-            price_text_y = PRICE_Y_START + (PRICE_H - price_text_bbox_h) // 2 - 10 
-            draw_centered_text(draw, texts["price"], price_text_y, price_font, T["price_text"], max_width=PRICE_W, alpha=alpha)
-                
-    # 2d. Draw TIPS (Content Video - ALL ANIMATION STYLES)
-    if content_type == "Content Video":
-        
-        tip_text = texts.get("full_tips", "")
-        tips = [line.strip('*').strip('-').strip() for line in tip_text.split('\n')[1:] if line.strip().startswith('*') or line.strip().startswith('-')]
-        
-        if tips:
-            line_height = 70 
-            start_y = 450 if img else 450
-            
-            # --- ANIMATION STYLE LOGIC ---
-            
-            if animation_style == "Typewriter (Sequential Reveal)":
-                # ... (Typewriter logic using TIP_FONT and precise layout) ...
-                CHAR_PER_SECOND = 40
-                START_TIME = 3.5      
-                TIP_DELAY = 0.5       
-                cumulative_delay = START_TIME
-                
-                for i, full_tip in enumerate(tips):
-                    tip_len = len(full_tip)
-                    tip_duration = tip_len / CHAR_PER_SECOND
-                    tip_start_time = cumulative_delay
-                    
-                    if t >= tip_start_time:
-                        time_in_tip = max(0, t - tip_start_time)
-                        chars_to_show = min(tip_len, math.floor(time_in_tip * CHAR_PER_SECOND))
-                        current_tip_text = full_tip[:chars_to_show]
-                        
-                        y_pos = start_y + (i * line_height)
-                        tip_bbox = draw.textbbox((0,0), full_tip, font=TIP_FONT)
-                        tip_w = tip_bbox[2]
-                        padding = 20
-                        
-                        alpha_ratio_bg = min(1.0, (t - tip_start_time) / 0.15)
-                        draw.rounded_rectangle(
-                            [ (WIDTH-tip_w-padding)//2 - 10, y_pos - 15, (WIDTH+tip_w+padding)//2 + 10, y_pos + line_height - 15],
-                            radius=10,
-                            fill=(*hex_to_rgb(BRAND_ACCENT), int(180 * alpha_ratio_bg)) 
-                        )
-                        text_offset_y = (line_height - tip_bbox[3]) // 2 
-                        draw.text(((WIDTH - tip_w) // 2, y_pos - 15 + text_offset_y), 
-                                  current_tip_text, 
-                                  font=TIP_FONT, 
-                                  fill=T["text"])
-                    
-                    cumulative_delay = tip_start_time + tip_duration + TIP_DELAY
-
-            elif animation_style == "Smooth Fade (All at Once)":
-                # ... (Smooth Fade logic using TIP_FONT and precise layout) ...
-                FADE_START = 3.5
-                FADE_DURATION = 0.8
-                alpha = int(255 * linear_fade(t, FADE_START, FADE_DURATION))
-                
-                if alpha > 0:
-                    for i, full_tip in enumerate(tips):
-                        y_pos = start_y + (i * line_height)
-                        tip_bbox = draw.textbbox((0,0), full_tip, font=TIP_FONT)
-                        tip_w = tip_bbox[2]
-                        padding = 20
-                        
-                        draw.rounded_rectangle(
-                             [ (WIDTH-tip_w-padding)//2 - 10, y_pos - 15, (WIDTH+tip_w+padding)//2 + 10, y_pos + line_height - 15],
-                            radius=10,
-                            fill=(*hex_to_rgb(BRAND_ACCENT), int(180 * (alpha/255))) 
-                        )
-                        text_offset_y = (line_height - tip_bbox[3]) // 2
-                        draw.text(((WIDTH - tip_w) // 2, y_pos - 15 + text_offset_y), 
-                                  full_tip, 
-                                  font=TIP_FONT, 
-                                  fill=(*hex_to_rgb(T["text"]), alpha)
-                        )
-            
-            elif animation_style == "Block Reveal (Sequential Block Fade)":
-                # ... (Block Reveal logic) ...
-                START_TIME = 3.5
-                BLOCK_INTERVAL = 0.4
-                FADE_DURATION = 0.3
-                
-                for i, full_tip in enumerate(tips):
-                    block_start = START_TIME + i * BLOCK_INTERVAL
-                    alpha = int(255 * linear_fade(t, block_start, FADE_DURATION))
-                    
-                    if alpha > 0:
-                        y_pos = start_y + (i * line_height)
-                        tip_bbox = draw.textbbox((0,0), full_tip, font=TIP_FONT)
-                        tip_w = tip_bbox[2]
-                        padding = 20
-
-                        draw.rounded_rectangle(
-                            [ (WIDTH-tip_w-padding)//2 - 10, y_pos - 15, (WIDTH+tip_w+padding)//2 + 10, y_pos + line_height - 15],
-                            radius=10,
-                            fill=(*hex_to_rgb(BRAND_ACCENT), int(180 * (alpha/255))) 
-                        )
-                        
-                        text_offset_y = (line_height - tip_bbox[3]) // 2
-                        draw.text(((WIDTH - tip_w) // 2, y_pos - 15 + text_offset_y), 
-                                  full_tip, 
-                                  font=TIP_FONT, 
-                                  fill=(*hex_to_rgb(T["text"]), alpha)
-                        )
-
-    # --- BLOCK 3: Draw Logo (Highest Layer) ---
-    logo_box = next((b for b in boxes if b["role"] == "logo"), None)
-    if logo_box:
-        if logo_img:
+    with timings.stage("base.vignette"):
+        layers.apply_vignette(base, start=0.65, strength=200)
+
+    if logo_box and logo_img:
+        with timings.stage("base.logo"):
             logo_resized = logo_img.resize((logo_box["w"], logo_box["h"]), Image.LANCZOS)
-            canvas.paste(logo_resized, (logo_box["x"], logo_box["y"]), logo_resized)
-            
-    # Vignette (UNCHANGED)
-    vig = Image.new("RGBA", (WIDTH, HEIGHT), (0,0,0,0))
-    vdraw = ImageDraw.Draw(vig)
-    for y in range(int(HEIGHT*0.65), HEIGHT):
-        a = int(200 * (y - HEIGHT*0.65) / (HEIGHT*0.35))
-        vdraw.line([(0,y), (WIDTH,y)], fill=(0,0,0,a))
-    canvas.paste(vig, (0,0), vig)
+            layers.paste(base, logo_resized, (logo_box["x"], logo_box["y"]))
+    return base
+
+def get_static_base(tpl_name, logo_img, logo_box):
+    logo_geom = tuple(logo_box[k] for k in ("x", "y", "w", "h")) if logo_box else None
+    return layers.cached_base(("smart", tpl_name, WIDTH, HEIGHT, logo_geom),
+                              lambda: build_static_base(tpl_name, logo_img, logo_box),
+                              logo_img)
+
+@functools.lru_cache(maxsize=64)
+def text_sprite(text, y, font, color, max_width):
+    """Centred, wrapped text block rendered once at full opacity."""
+    layout = text_layout.layout_text(text, font, max_width)
+    return text_sprites.render(text_sprites.layout_items(layout, y, font, hex_to_rgb(color), WIDTH))
+
+@functools.lru_cache(maxsize=16)
+def price_sprite(price, box, font, bg_color, text_color):
+    """Rounded price button with its centred text, rendered once at full opacity."""
+    x, y, w, h = box
+    text_h = text_layout.text_bbox(price.split('\n')[0], font)[3]
+    text_y = y + (h - text_h) // 2 - 10
+    layout = text_layout.layout_text(price, font, w)
+    items = text_sprites.layout_items(layout, text_y, font, hex_to_rgb(text_color), WIDTH)
+    return text_sprites.render(items, pill=((x, y, x + w, y + h), hex_to_rgb(bg_color), 30))
+
+def tip_pill_box(tip_w, y_pos, line_height):
+    padding = 20
+    return [(WIDTH-tip_w-padding)//2 - 10, y_pos - 15, (WIDTH+tip_w+padding)//2 + 10, y_pos + line_height - 15]
+
+@functools.lru_cache(maxsize=64)
+def tip_sprite(tip, y_pos, line_height, font, text_color):
+    """One tip line on its translucent accent pill, rendered once at full opacity."""
+    _, _, tip_w, tip_h = text_layout.text_bbox(tip, font)
+    text_offset_y = (line_height - tip_h) // 2
+    items = [(((WIDTH - tip_w) // 2, y_pos - 15 + text_offset_y), tip, font, hex_to_rgb(text_color))]
+    return text_sprites.render(items, pill=(tip_pill_box(tip_w, y_pos, line_height), (*hex_to_rgb(BRAND_ACCENT), 180), 10))
+
+@functools.lru_cache(maxsize=64)
+def tip_pill_sprite(tip_w, y_pos, line_height):
+    """The accent pill alone, for tips whose text is revealed glyph by glyph."""
+    return text_sprites.render([], pill=(tip_pill_box(tip_w, y_pos, line_height), (*hex_to_rgb(BRAND_ACCENT), 180), 10))
+
+# Frames repaint only the layers that changed since the previous frame this process rendered
+FRAME_RENDERER = dirty.DirtyRenderer()
+
+# Animation timing for each content type, in seconds
+CAPTION_FADES = {
+    "Product Showcase": timeline.fade(1.0, 0.5),
+    "Content Video": timeline.keyframes((0.5, 0.0), (1.5, 1.0), (2.5, 1.0), (3.5, 0.0)),
+}
+PRICE_FADE = timeline.fade(1.4, 0.5)
+TIPS_START = 3.5
+
+class Scene(NamedTuple):
+    base: np.ndarray
+    timeline: timeline.Timeline
+
+def parse_tips(tip_text):
+    """Bullet lines after the first (title) line, without their markers."""
+    return [line.strip('*').strip('-').strip() for line in tip_text.split('\n')[1:]
+            if line.strip().startswith('*') or line.strip().startswith('-')]
+
+def product_element(img, box):
+    fit_w, fit_h = img.fit(box["w"], box["h"])
+
+    def paint(s):
+        # The trimmed sprite is fitted to the box, renditions are cached
+        with timings.stage("product.resize"):
+            prod = img.scaled(fit_w, fit_h, s.scale)
+        pw, ph = prod.size
+        # Shadow (blurred at reduced resolution, cached per rendition)
+        with timings.stage("product.shadow"):
+            shadow = effects.drop_shadow(prod, blur=20)
+        pad = (shadow.width - pw) // 2
+        return [dirty.image_layer(shadow, (int(box["x"]+(box["w"]-pw)//2+10-pad), int(box["y"]+(box["h"]-ph)//2+40-pad))),
+                dirty.image_layer(prod, (int(box["x"]+(box["w"]-pw)//2), int(box["y"]+(box["h"]-ph)//2 + s.y)))]
+
+    return timeline.Element("product", paint, scale=timeline.fade(0.0, 1 / 1.5, "ease_out_elastic"),
+                            y=timeline.wave(10, 3))
+
+def sprite_element(name, sprite, alpha):
+    return timeline.Element(name, lambda s: [dirty.sprite_layer(sprite, s.alpha)], alpha=alpha)
+
+def tip_elements(tips, animation_style, text_color):
+    """Tip lines laid out and timed for one animation style."""
+    TIP_FONT = get_font(42, "Serif")
+    line_height = 70
+    start_y = 450
+    elements = []
+
+    if animation_style == "Typewriter (Sequential Reveal)":
+        CHAR_PER_SECOND = 40
+        TIP_DELAY = 0.5
+        tip_start_time = TIPS_START
+        for i, full_tip in enumerate(tips):
+            tip_duration = len(full_tip) / CHAR_PER_SECOND
+            y_pos = start_y + (i * line_height)
+            _, _, tip_w, tip_h = text_layout.text_bbox(full_tip, TIP_FONT)
+            elements.append(sprite_element(f"tip_pill_{i}", tip_pill_sprite(tip_w, y_pos, line_height),
+                                           timeline.fade(tip_start_time, 0.15)))
+
+            # Glyphs revealed since the last frame are blitted into a persistent line buffer
+            line = glyph_atlas.typewriter_line(TIP_FONT, full_tip)
+            x = (WIDTH - tip_w) // 2 - line.pad_left
+            y = y_pos - 15 + (line_height - tip_h) // 2 - line.pad_top
+
+            def paint_typed(s, full_tip=full_tip, line=line, x=x, y=y):
+                chars = int(min(len(full_tip), math.floor(s.progress)))
+                with timings.stage("text.typewriter"):
+                    typed = text_sprites.from_mask(line.reveal(chars), x, y, hex_to_rgb(text_color))
+                return [dirty.sprite_layer(typed, key=("typed", full_tip, chars))]
+
+            elements.append(timeline.Element(
+                f"tip_text_{i}", paint_typed, alpha=timeline.step(tip_start_time),
+                progress=timeline.keyframes((tip_start_time, 0), (tip_start_time + tip_duration, len(full_tip)))))
+            tip_start_time += tip_duration + TIP_DELAY
+
+    elif animation_style == "Smooth Fade (All at Once)":
+        for i, full_tip in enumerate(tips):
+            elements.append(sprite_element(f"tip_{i}", tip_sprite(full_tip, start_y + (i * line_height), line_height, TIP_FONT, text_color),
+                                           timeline.fade(TIPS_START, 0.8)))
+
+    elif animation_style == "Block Reveal (Sequential Block Fade)":
+        BLOCK_INTERVAL = 0.4
+        for i, full_tip in enumerate(tips):
+            elements.append(sprite_element(f"tip_{i}", tip_sprite(full_tip, start_y + (i * line_height), line_height, TIP_FONT, text_color),
+                                           timeline.fade(TIPS_START + i * BLOCK_INTERVAL, 0.3)))
+    return elements
+
+def build_scene(img, boxes, texts, tpl_name, logo_img, content_type, animation_style, duration, fps=FPS):
+    """Lay out, time and pre-render everything once; frames then only index the compiled timeline.
+
+    The app passes its content pillar, "Product" or "Content", as
+    ``content_type``. The caption, price and tip layers and the smaller
+    product box only appear for "Product Showcase" and "Content Video", which
+    the app never passes.
+    """
+    T = TEMPLATES[tpl_name]
+    roles = {b["role"]: b for b in boxes}
+    with timings.stage("scene.base"):
+        base = get_static_base(tpl_name, logo_img, roles.get("logo"))
+
+    # --- FONT DEFINITIONS ---
+    HEADLINE_FONT = get_font(60, "Sans-Serif-Bold")
+    CONTACT_FONT = get_font(32, "Sans-Serif-Bold")
+
+    elements = []
+
+    # Product & Shadow (Layer 1)
+    if "product" in roles and img:
+        box = dict(roles["product"])
+        if content_type == "Content Video":  # Smaller product for content videos
+            box["y"], box["h"] = 250, 400
+        elements.append(product_element(img, box))
+
+    # Text elements: pre-rasterized sprites, faded as array ops when painted
+    with timings.stage("scene.text"):
+        if "contact" in roles:
+            sprite = text_sprite(texts["contact"], roles["contact"].get('y', 1200), CONTACT_FONT, T["text"], 600)
+            elements.append(sprite_element("contact", sprite, timeline.fade(duration - 1.5, 0.5)))
+
+        if "caption" in roles and content_type in CAPTION_FADES:
+            sprite = text_sprite(texts["caption"], roles["caption"].get('y', 150), HEADLINE_FONT, T["accent"], 600)
+            elements.append(sprite_element("caption", sprite, CAPTION_FADES[content_type]))
+
+        if content_type == "Product Showcase" and "price" in roles:
+            b = roles["price"]
+            sprite = price_sprite(texts["price"], (b["x"], b["y"], b["w"], b["h"]), get_font(68), T["price_bg"], T["price_text"])
+            elements.append(sprite_element("price", sprite, PRICE_FADE))
+
+        if content_type == "Content Video":
+            elements += tip_elements(parse_tips(texts.get("full_tips", "")), animation_style, T["text"])
+
+    with timings.stage("scene.compile"):
+        compiled = timeline.compile_timeline(elements, duration, fps)
+    return Scene(base, compiled)
+
+def create_frame(t, scene):
+    with timings.stage("layers"):
+        frame_layers = scene.timeline.layers(t)
+    # Only layers that changed since the last frame are repainted
+    with timings.stage("composite"):
+        return FRAME_RENDERER.render(scene.base, frame_layers)
+
+def frame_renderer(*scene_args):
+    """``render(t)`` for ``build_scene(*scene_args)``; render workers build their scene with it."""
+    scene = build_scene(*scene_args)
+    return lambda t: create_frame(t, scene)
+
+def show_timings(panel, report_json):
+    """Stage timing breakdown in ``panel``, with the JSON for download."""
+    with panel:
+        st.dataframe(json.loads(report_json)["stages"], use_container_width=True)
+        st.download_button("Download Timings (JSON)", report_json, "render_timings.json", "application/json")
 
-    return np.array(canvas)
 
 # ================================
 # UI LOGIC (FINALIZED with Product Upload)
@@ -495,7 +473,8 @@ with st.sidebar:
         u_style = st.selectbox("Template", list(TEMPLATES.keys()))
         u_music = st.selectbox("Music", list(MUSIC_TRACKS.keys()))
         u_animation_style = "Simple Fade" # Placeholder
-        btn_ad = st.button(f"Generate {u_duration}s Product Ad", type="primary")
+        u_caption_text = ""
+        ad_label = f"{u_duration}s Product Ad"
         
     else: # Content Video (Pillar B)
         st.subheader("Content Details")
@@ -507,8 +486,11 @@ with st.sidebar:
         u_model = st.text_input("Product/Topic for Tip", "Nursery safety")
         u_type = st.radio("Tip Category", ["DIY Tips", "Furniture Tips", "Interior Design Tips", "Maintenance Tips"])
         
-        if st.button(f"Generate Tips for '{u_model}'", key="tip_gen_btn"):
-            u_tips_text = generate_tips(u_type, u_model)
+        tips_btn = st.button(f"Generate Tips for '{u_model}'", key="tip_gen_btn")
+        # Tips for a topic are cached for a day; Regenerate asks the model again
+        regen_btn = st.button("🔄 Regenerate Tips", key="tip_regen_btn")
+        if tips_btn or regen_btn:
+            u_tips_text = generate_tips(u_type, u_model, refresh=regen_btn)
             st.session_state['generated_tips'] = u_tips_text
         
         u_caption_text = st.text_area("Final Caption/Tips", 
@@ -528,53 +510,92 @@ with st.sidebar:
         
         u_price = "" 
         
-        btn_ad = st.button(f"Generate {u_duration}s Content Video", type="primary")
-
+        ad_label = f"{u_duration}s Content Video"
+
+    u_segment_profile = st.selectbox("Background Removal", list(segmentation.PROFILES),
+                                     index=list(segmentation.PROFILES).index(segmentation.PROFILE),
+                                     help="Speed/quality trade-off for removing the product photo background.")
+    # The segmentation model loads and warms up in the background while the page renders
+    segmentation.shared_pool(u_segment_profile)
+    u_timings = st.checkbox("Show Render Timings", help="Time each render stage and show a breakdown table.")
+
+    # A quick draft comes first; the full-quality render unlocks once a draft of exactly these inputs was shown
+    job_key = draft.signature(u_content_type, u_duration, u_file.getvalue() if u_file else None, u_model,
+                              u_price, u_contact, u_style, u_music, u_animation_style, u_caption_text,
+                              u_segment_profile)
+    job = st.session_state.get('job')
+    has_draft = job is not None and job["key"] == job_key
+    btn_draft = st.button(f"Preview {ad_label} Draft", type="primary")
+    btn_ad = st.button(f"Approve & Render Final {ad_label}", disabled=not has_draft,
+                       help="Renders the full-quality video once you have checked the draft.")
+
+
+if has_draft and not btn_ad:
+    st.subheader("Draft Preview")
+    st.video(job["draft"])
+    w, h = job["draft_size"]
+    st.caption(f"{w}×{h} at {draft.DRAFT_FPS} fps, no music. Approve it to render the full-quality video.")
+    if job.get("timings"):
+        show_timings(st.expander("Draft Render Timings"), job["timings"])
 
 # Video Ad Generation Logic
-if btn_ad:
+if btn_draft or btn_ad:
     global DURATION
     DURATION = u_duration 
     
-    status = st.status(f"Creating your {u_content_type} video...", expanded=True)
+    status = st.status(f"Creating your {u_content_type} {'draft' if btn_draft else 'video'}...", expanded=True)
+    timings.enable(u_timings)
+    timings.reset()
 
-    # 1. Process image (Crucial step for Product Showcase)
-    product_img = None
-    if u_file:
-        status.update(label="Processing image...")
-        raw = Image.open(u_file).convert("RGBA")
-        
-        if u_content_type == "Product Showcase (Pillar A/C)":
-            # Only remove background for product ads
-            product_img = process_image_pro(raw)
-        else:
-            # Use raw image as background for content videos
-            product_img = raw
-            
-        st.image(product_img, "Processed Image", width=200)
-
-    # 1.1 Check for Product Showcase image requirement
-    if u_content_type == "Product Showcase (Pillar A/C)" and not u_file:
+    showcase = u_content_type == "Product Showcase (Pillar A/C)"
+    if btn_draft and showcase and not u_file:
         st.error("Product Showcase requires a Product Image upload.")
         status.update(label="Failed", state="error")
         st.stop()
 
-
-    # 2. AI hook + smart layout mapping
-    status.update(label="AI determining layout...")
-    
-    if u_content_type == "Product Showcase (Pillar A/C)":
-        hook, layout = get_data_groq(product_img, u_model)
-    else: # Content Video Logic
-        hook = u_caption_text.split('\n')[0].strip()
+    if btn_ad:
+        # The approved draft's processed image, hook and layout are reused as they are
+        product_step = lambda: job["product_img"]
+        hook_step = lambda img: job["hook"]
+        layout_step = lambda: job["layout"]
+    elif showcase:
+        # Only remove background for product ads; the vision hook needs the cut-out, the layout does not
+        raw = Image.open(u_file).convert("RGBA")
+        product_step = lambda: process_image_pro(raw, u_segment_profile)
+        hook_step = lambda img: get_hook_groq(img, u_model)
+        layout_step = lambda: get_layout_groq(u_model)
+    else: # Content Video Logic: the raw image (if any) is the background, the first caption line the hook
+        raw = Image.open(u_file).convert("RGBA") if u_file else None
         fixed_layout = {'logo': 'LOGO_TOP', 'product': 'PRODUCT_CENTER', 'caption': 'CAPTION_HEADLINE', 'contact': 'CONTACT_FOOTER'}
         layout_map = {"LOGO_TOP": {"x": 50, "y": 50, "w": 200, "h": 100}, "PRODUCT_CENTER": {"x": 60, "y": 250, "w": 600, "h": 600}, "CAPTION_HEADLINE": {"x": 50, "y": 150, "w": 620, "h": 120}, "CONTACT_FOOTER": {"x": 60, "y": 1200, "w": 600, "h": 60}}
-        layout = [layout_map[block_name].copy() | {'role': role} for role, block_name in fixed_layout.items() if role in ['logo', 'product', 'caption', 'contact']]
+        content_layout = [layout_map[block_name].copy() | {'role': role} for role, block_name in fixed_layout.items() if role in ['logo', 'product', 'caption', 'contact']]
+        product_step = lambda: raw
+        hook_step = lambda img: u_caption_text.split('\n')[0].strip()
+        layout_step = lambda: content_layout
+
+    # 1-2. The job's stages as a dependency graph: background removal, the text-only layout call,
+    # the logo, the static background and the music all run at once; the hook starts with the cut-out
+    status.update(label="Processing image & asking AI...")
+    steps = {
+        "product": (product_step, ()),
+        "hook": (hook_step, ("product",)),
+        "layout": (layout_step, ()),
+        "logo": (lambda: get_cached_logo(LOGO_URL, WIDTH, HEIGHT), ()),
+        # Composed into the shared base cache, where build_scene finds it
+        "base": (lambda logo, boxes: get_static_base(u_style, logo, {b["role"]: b for b in boxes}.get("logo")),
+                 ("logo", "layout")),
+    }
+    if btn_ad:
+        steps["music"] = (lambda: assets.path(MUSIC_TRACKS[u_music]), ())
+    pipeline = taskgraph.start(steps)
 
+    product_img = pipeline.result("product")
+    if product_img and not btn_ad:
+        st.image(product_img, "Processed Image", width=200)
+    hook, layout = pipeline.result("hook"), pipeline.result("layout")
     st.write(f"**Video Hook:** {hook}")
-    
-    # 2.5 Load Logo
-    logo_img = get_cached_logo(LOGO_URL, WIDTH, HEIGHT)
+    logo_img = pipeline.result("logo")
+    pipeline.result("base")
 
     # 3. Render frames
     status.update(label="Animating frames...")
@@ -584,30 +605,55 @@ if btn_ad:
     if content_pillar_key == "Content":
         texts["full_tips"] = u_caption_text
     
-    frames = [create_frame(i/FPS, product_img, layout, texts, u_style, logo_img, content_pillar_key, u_animation_style) for i in range(FPS*DURATION)]
-    clip = ImageSequenceClip(frames, fps=FPS)
-
-    # 4. Add music & 5. Export
+    product_sprite = ProductSprite(product_img) if product_img else None
+    fps = draft.DRAFT_FPS if btn_draft else FPS
+    # Each render worker builds the scene from these inputs; see frame_renderer
+    render = parallel.AppRender(__file__, "frame_renderer", (product_sprite, layout, texts, u_style, logo_img,
+                                                              content_pillar_key, u_animation_style, DURATION, fps))
+    progress_bar = st.progress(0)
+    def report(done, total):
+        if done % 10 == 0 or done == total:
+            progress_bar.progress(done / total)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
+        video_path = tmp.name
+
+    if btn_draft:
+        try:
+            size = draft.render_draft(render, DURATION, video_path, WIDTH, HEIGHT,
+                                      fps=fps, progress=report)
+            with open(video_path, "rb") as f:
+                st.session_state['job'] = {"key": job_key, "product_img": product_img, "hook": hook,
+                                           "layout": layout, "draft": f.read(), "draft_size": size,
+                                           "timings": timings.to_json(app="smart", mode="draft", template=u_style,
+                                                                      content_type=content_pillar_key, fps=fps)
+                                                      if u_timings else None}
+        finally:
+            os.unlink(video_path)
+        status.update(label="Draft ready", state="complete")
+        st.rerun()
+
+    frames = parallel.render_frames(
+        render,
+        FPS*DURATION, FPS, progress=report)
+    # Frames stream straight into ffmpeg as they are rendered; static stretches become held frames
+    encoder.encode_video(frames, video_path, WIDTH, HEIGHT, FPS, hold_frames="exact", n_frames=FPS*DURATION)
+
+    # 4. Add music (fetched while the frames rendered) & 5. Export
     status.update(label="Adding music & exporting...")
     try:
-        audio_data = requests.get(MUSIC_TRACKS[u_music]).content
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(audio_data)
-            audio = AudioFileClip(tmp.name).subclip(0, DURATION).audio_fadeout(0.8)
-            final = clip.set_audio(audio)
-            os.unlink(tmp.name)
+        encoder.add_audio(video_path, pipeline.result("music"), DURATION, fade_out=0.8, fps=FPS)
     except Exception as e:
-        final = clip
         st.warning(f"Music failed – silent video. Error: {e}")
 
     output_filename = f"SM_{content_pillar_key}_{u_model.replace(' ', '_')}_{DURATION}s.mp4"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        final.write_videofile(tmp.name, codec="libx264", audio_codec="aac", fps=FPS, logger=None, verbose=False)
-        st.video(tmp.name)
-        with open(tmp.name, "rb") as f:
-            st.download_button("Download Video", f, output_filename, "video/mp4")
-        os.unlink(tmp.name)
-
+    st.video(video_path)
+    with open(video_path, "rb") as f:
+        st.download_button("Download Video", f, output_filename, "video/mp4")
+    os.unlink(video_path)
+
+    if u_timings:
+        show_timings(status, timings.to_json(app="smart", mode="final", template=u_style,
+                                             content_type=content_pillar_key, fps=FPS))
     status.update(label="Done! Your ad is ready", state="complete")
 
 st.caption("AdGen EVO by Grok × Streamlit – 2025 Edition")
@@ -0,0 +1,77 @@
+"""Product sprite stage for the scale-in and float animations.
+
+The background-removed product is trimmed to its alpha bounding box once,
+a mip pyramid is built from it, and scaled renditions are served from an LRU
+keyed by quantised size. Once an animation settles at scale 1.0 every frame
+gets the same cached sprite back instead of paying for a LANCZOS resample.
+"""
+from PIL import Image
+
+from lru import LRUCache
+
+SCALE_STEPS = 128      # scales are quantised to 1/128 steps
+MIN_LEVEL_SIDE = 32    # stop halving the pyramid below this size
+
+
+def quantize_scale(scale):
+    return round(scale * SCALE_STEPS) / SCALE_STEPS
+
+
+class ProductSprite:
+    """A trimmed product cut-out with cached renditions at any box size."""
+
+    def __init__(self, img, max_entries=32):
+        img = img.convert("RGBA")
+        bbox = img.getchannel("A").getbbox()
+        if bbox:
+            img = img.crop(bbox)
+        self.image = img
+        self.levels = [img]
+        while min(self.levels[-1].size) >= 2 * MIN_LEVEL_SIDE:
+            self.levels.append(self.levels[-1].reduce(2))
+        self._renditions = LRUCache(max_entries)
+
+    def __reduce__(self):
+        # Render workers (see :mod:`parallel`) get the trimmed image and rebuild the pyramid
+        return ProductSprite, (self.image, self._renditions.max_entries)
+
+    @property
+    def width(self):
+        return self.image.width
+
+    @property
+    def height(self):
+        return self.image.height
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def fit(self, box_w, box_h):
+        """Largest (w, h) with the sprite's aspect ratio that fits inside the box."""
+        ratio = min(box_w / self.width, box_h / self.height)
+        return max(1, int(self.width * ratio)), max(1, int(self.height * ratio))
+
+    def resized(self, w, h):
+        """The sprite at exactly (w, h); cached, so repeated sizes cost nothing."""
+        return self._renditions.get_or_build((w, h), lambda: self._resample(w, h))
+
+    def scaled(self, base_w, base_h, scale):
+        """The sprite for a (base_w, base_h) box at animation ``scale``.
+
+        ``scale`` is snapped to the nearest 1/SCALE_STEPS so neighbouring frames
+        share renditions; at rest (1.0) this is always the same cached image.
+        """
+        q = quantize_scale(scale)
+        return self.resized(max(1, int(base_w * q)), max(1, int(base_h * q)))
+
+    def _resample(self, w, h):
+        # Smallest pyramid level that still covers the target keeps LANCZOS cheap
+        src = self.levels[0]
+        for level in self.levels[1:]:
+            if level.width < w or level.height < h:
+                break
+            src = level
+        if src.size == (w, h):
+            return src
+        return src.resize((w, h), Image.LANCZOS)
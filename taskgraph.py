@@ -0,0 +1,143 @@
+"""Run a job's independent steps concurrently, each starting as soon as the steps it needs are done.
+
+A job is a dict ``{name: (fn, deps)}``: ``fn`` is called with the results
+of the ``deps`` steps, in order, from a worker thread. ::
+
+    results = taskgraph.run({
+        "hook": (lambda: generate_hook(product), ()),
+        "layout": (lambda: generate_layout(product), ()),
+        "caption": (lambda hook: generate_caption(product, hook), ("hook",)),
+    })
+
+``hook`` and ``layout`` start together and ``caption`` starts the moment
+``hook`` returns. :func:`start` returns the running :class:`Job` instead, so
+the caller can take each result when it needs it (``job.result("hook")``)
+and get on with its own work, such as rendering frames, in the meantime.
+
+The apps' steps are mostly network calls (LLM requests, downloads) or native
+code that releases the GIL (onnxruntime, Pillow), so threads overlap them
+well. Worker threads are attached to the calling Streamlit script run, so
+steps can still use ``st`` to show spinners and errors. Steps run in a copy
+of the caller's context variables, so with :mod:`timings` on each step is
+timed as the ``job.<name>`` stage of the caller's render.
+"""
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import timings
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:   # headless (bench.py) or an older Streamlit: steps just run without a script context
+    add_script_run_ctx = get_script_run_ctx = None
+
+
+def _check(tasks):
+    """Reject unknown dependencies and cycles before anything starts."""
+    for name, (_, deps) in tasks.items():
+        unknown = [d for d in deps if d not in tasks]
+        if unknown:
+            raise ValueError(f"step {name!r} depends on unknown step(s): {', '.join(unknown)}")
+    ordered, left = set(), dict(tasks)
+    while left:
+        ready = [n for n, (_, deps) in left.items() if ordered.issuperset(deps)]
+        if not ready:
+            raise ValueError(f"dependency cycle between steps: {', '.join(left)}")
+        for n in ready:
+            ordered.add(n)
+            del left[n]
+
+
+class Job:
+    """The running steps of one job; see :func:`start`."""
+
+    def __init__(self, tasks, max_workers=None):
+        _check(tasks)
+        self._tasks = tasks
+        self._futures = {name: Future() for name in tasks}
+        self._waiting = {name: len(set(deps)) for name, (_, deps) in tasks.items()}
+        self._dependents = {name: [] for name in tasks}
+        for name, (_, deps) in tasks.items():
+            for d in set(deps):
+                self._dependents[d].append(name)
+        self._failed = set()   # steps failed because an input failed, before they are settled
+        self._lock = threading.Lock()
+        self._left = len(tasks)
+        self._context = contextvars.copy_context()
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+        def attach():
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+
+        self._pool = ThreadPoolExecutor(max_workers or max(1, len(tasks)), thread_name_prefix="taskgraph",
+                                        initializer=attach)
+        if not tasks:
+            self._pool.shutdown(wait=False)
+        for name in [n for n, count in self._waiting.items() if count == 0]:
+            self._submit(name)
+
+    def _submit(self, name):
+        fn, deps = self._tasks[name]
+        args = [self._futures[d].result() for d in deps]
+
+        def step():
+            with timings.stage(f"job.{name}"):
+                return fn(*args)
+
+        # A context can be entered by one thread at a time, so each step gets its own copy
+        self._pool.submit(self._context.copy().run, step).add_done_callback(lambda f: self._settle(name, f.exception(), f))
+
+    def _settle(self, name, error, inner=None):
+        """Record ``name``'s outcome; start dependents that are now ready, or fail them with ``error``."""
+        if error is None:
+            self._futures[name].set_result(inner.result())
+        else:
+            self._futures[name].set_exception(error)
+        ready, failed = [], []
+        with self._lock:
+            self._left -= 1
+            for d in self._dependents[name]:
+                if d in self._failed:
+                    continue
+                if error is not None:
+                    self._failed.add(d)
+                    failed.append(d)
+                else:
+                    self._waiting[d] -= 1
+                    if self._waiting[d] == 0:
+                        ready.append(d)
+            done = self._left == 0
+        for d in failed:
+            self._settle(d, error)   # a step never starts after one of its inputs failed
+        for d in ready:
+            self._submit(d)
+        if done:
+            self._pool.shutdown(wait=False)
+
+    def result(self, name=None, timeout=None):
+        """Wait for step ``name`` and return its result, re-raising its (or an input's) exception.
+
+        Without a ``name``, wait for every step and return ``{name: result}``.
+        """
+        if name is not None:
+            return self._futures[name].result(timeout)
+        for future in self._futures.values():
+            future.exception(timeout)
+        return {n: f.result() for n, f in self._futures.items()}
+
+
+def start(tasks, max_workers=None):
+    """Start ``tasks`` in worker threads and return the :class:`Job` without waiting."""
+    return Job(tasks, max_workers)
+
+
+def run(tasks, max_workers=None):
+    """Run ``tasks`` and return ``{name: result}``.
+
+    If a step raises, the steps that depend on it are never started, and
+    once every other step has finished the first failed step's exception
+    (in ``tasks`` order) is re-raised.
+    """
+    return start(tasks, max_workers).result()
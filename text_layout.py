@@ -0,0 +1,85 @@
+"""Memoized text layout for the frame renderers.
+
+Line breaks and per-line geometry are computed once per (text, font, size,
+max_width) from advance-width metrics, without rasterizing anything, and the
+resulting layout is cached. Renderers draw the precomputed layout each frame.
+"""
+from typing import NamedTuple
+
+from lru import LRUCache
+
+LINE_SPACING = 8
+
+_LAYOUTS = LRUCache(max_entries=256)
+_BBOXES = LRUCache(max_entries=1024)
+
+
+class LayoutLine(NamedTuple):
+    text: str
+    width: int    # right edge of the ink box, used for centring
+    height: int   # bottom edge of the ink box
+    y: int        # offset from the top of the block
+
+
+class TextLayout(NamedTuple):
+    lines: tuple
+    width: int
+    height: int   # full block height including line spacing
+
+    def line_x(self, line, canvas_width):
+        return (canvas_width - line.width) // 2
+
+
+def font_key(font):
+    """Hashable identity for a font: file, size and face for TrueType fonts."""
+    path = getattr(font, "path", None)
+    if isinstance(path, str):
+        return (path, font.size, getattr(font, "index", 0))
+    return ("font", id(font))
+
+
+def text_bbox(text, font):
+    """``font.getbbox(text)``, cached per (text, font)."""
+    key = (text, font_key(font))
+    return _BBOXES.get_or_build(key, lambda: font.getbbox(text))
+
+
+def wrap_words(text, font, max_width):
+    """Greedy word wrap on advance widths (``font.getlength``); never emits empty lines."""
+    lines = []
+    line = ""
+    for word in text.split():
+        test = line + (" " + word if line else word)
+        if not line or font.getlength(test) <= max_width:
+            line = test
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def layout_text(text, font, max_width, spacing=LINE_SPACING):
+    """Cached :class:`TextLayout` for ``text`` wrapped to ``max_width``."""
+    key = (text, font_key(font), max_width, spacing)
+    return _LAYOUTS.get_or_build(key, lambda: _build_layout(text, font, max_width, spacing))
+
+
+def _build_layout(text, font, max_width, spacing):
+    lines = []
+    y = 0
+    width = 0
+    for line in wrap_words(text, font, max_width):
+        _, _, w, h = text_bbox(line, font)
+        lines.append(LayoutLine(line, w, h, y))
+        width = max(width, w)
+        y += h + spacing
+    return TextLayout(tuple(lines), width, y)
+
+
+def draw_layout(draw, layout, y, font, fill, canvas_width):
+    """Draw a layout centred horizontally on the canvas; returns the y below the block."""
+    for line in layout.lines:
+        draw.text((layout.line_x(line, canvas_width), y + line.y), line.text, font=font, fill=fill)
+    return y + layout.height
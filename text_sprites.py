@@ -0,0 +1,112 @@
+"""Pre-rasterized text sprites with vectorized alpha fades.
+
+Text blocks (and their rounded-rectangle backgrounds) that only change
+opacity over time are rasterized once into premultiplied RGBA sprites.
+Each frame then applies its fade as a NumPy alpha multiply and composite
+instead of re-shaping and re-drawing the glyphs through ImageDraw.
+"""
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from layers import clip_box
+
+
+class Sprite(NamedTuple):
+    x: int
+    y: int
+    rgb: np.ndarray     # (h, w, 3) float32, premultiplied, 0..255
+    alpha: np.ndarray   # (h, w) float32, 0..1
+
+    @property
+    def width(self):
+        return self.alpha.shape[1]
+
+    @property
+    def height(self):
+        return self.alpha.shape[0]
+
+    @property
+    def box(self):
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+
+def from_image(img, x, y):
+    """Premultiplied sprite from an RGBA PIL image placed at (x, y)."""
+    arr = np.asarray(img.convert("RGBA"), dtype=np.float32)
+    alpha = arr[:, :, 3] / 255.0
+    return Sprite(int(x), int(y), arr[:, :, :3] * alpha[:, :, None], alpha)
+
+
+def from_mask(mask, x, y, fill):
+    """Sprite of a solid ``fill`` colour shaped by a uint8 alpha ``mask``."""
+    alpha = mask.astype(np.float32) / 255.0
+    rgb = alpha[:, :, None] * np.asarray(fill[:3], dtype=np.float32)
+    return Sprite(int(x), int(y), rgb, alpha)
+
+
+def layout_items(layout, y, font, fill, canvas_width):
+    """Text items for every line of a :class:`text_layout.TextLayout` centred on the canvas."""
+    return [((layout.line_x(line, canvas_width), y + line.y), line.text, font, fill)
+            for line in layout.lines]
+
+
+def render(items, pill=None):
+    """Rasterize text ``items`` over an optional rounded ``pill`` into one sprite.
+
+    ``items`` are ``((x, y), text, font, fill)`` tuples in canvas coordinates;
+    ``pill`` is ``(box, fill, radius)``. Fills are RGB or RGBA tuples.
+    """
+    boxes = [(x + l, y + t, x + r, y + b)
+             for (x, y), text, font, _ in items
+             for l, t, r, b in [font.getbbox(text)]]
+    if pill:
+        boxes.append(tuple(pill[0]))
+    x0 = int(min(b[0] for b in boxes))
+    y0 = int(min(b[1] for b in boxes))
+    x1 = int(max(b[2] for b in boxes)) + 1
+    y1 = int(max(b[3] for b in boxes)) + 1
+    size = (x1 - x0, y1 - y0)
+
+    tile = Image.new("RGBA", size, (0, 0, 0, 0))
+    if pill:
+        box, fill, radius = pill
+        ImageDraw.Draw(tile).rounded_rectangle(
+            [box[0] - x0, box[1] - y0, box[2] - x0, box[3] - y0], radius=radius, fill=fill)
+    for (x, y), text, font, fill in items:
+        # Start from the text colour at zero alpha so antialiased edges stay straight-alpha
+        layer = Image.new("RGBA", size, tuple(fill[:3]) + (0,))
+        ImageDraw.Draw(layer).text((x - x0, y - y0), text, font=font, fill=tuple(fill))
+        tile = Image.alpha_composite(tile, layer)
+    return from_image(tile, x0, y0)
+
+
+def composite(frame, sprite, opacity=1.0, clip=None):
+    """Composite ``sprite`` over a uint8 RGB/RGBA ``frame`` in place at ``opacity``.
+
+    With a ``clip`` box only the pixels inside it are written.
+    """
+    if opacity <= 0:
+        return frame
+    h, w = frame.shape[:2]
+    box = clip_box(sprite.box, (0, 0, w, h))
+    if box and clip:
+        box = clip_box(box, clip)
+    if box is None:
+        return frame
+    x0, y0, x1, y1 = box
+
+    sy, sx = slice(y0 - sprite.y, y1 - sprite.y), slice(x0 - sprite.x, x1 - sprite.x)
+    a = sprite.alpha[sy, sx]
+    rgb = sprite.rgb[sy, sx]
+    if opacity < 1.0:
+        a = a * np.float32(opacity)
+        rgb = rgb * np.float32(opacity)
+
+    region = frame[y0:y1, x0:x1]
+    keep = 1.0 - a
+    region[:, :, :3] = (region[:, :, :3] * keep[:, :, None] + rgb + 0.5).astype(np.uint8)
+    if frame.shape[2] == 4:
+        region[:, :, 3] = (region[:, :, 3] * keep + 255.0 * a + 0.5).astype(np.uint8)
+    return frame
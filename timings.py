@@ -0,0 +1,133 @@
+"""Opt-in per-stage timing for the frame renderers.
+
+Renderers wrap their stages in ``with timings.stage("product.shadow"):``.
+While timing is off (the default) that is one context-variable lookup
+handing back a shared no-op context manager. :func:`enable` starts a
+:class:`Timings` for the current context, which is the Streamlit script run
+doing the render, so concurrent sessions never mix their numbers. Every
+stage's call count, total and worst time are aggregated there. Steps run by
+:mod:`taskgraph` record into the same :class:`Timings`, and frames rendered
+in :mod:`parallel` pool workers carry their worker's stats back with each
+frame, so :func:`report` covers the whole render. ``RENDER_TIMINGS=1``
+turns on one process-wide :class:`Timings` for contexts that never called
+:func:`enable`.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+
+ENV = "RENDER_TIMINGS"
+
+
+class Timings:
+    """Stage stats of one render: stage -> [calls, total seconds, worst seconds]."""
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, calls=1, worst=None):
+        with self.lock:
+            entry = self.stats.get(name)
+            if entry is None:
+                self.stats[name] = [calls, seconds, seconds if worst is None else worst]
+            else:
+                entry[0] += calls
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds if worst is None else worst)
+
+
+_current = contextvars.ContextVar("timings", default=Timings() if os.environ.get(ENV, "") not in ("", "0") else None)
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enabled():
+    return _current.get() is not None
+
+
+def enable(on=True):
+    """Time this context's render from here on, into a fresh :class:`Timings`; or stop timing it."""
+    _current.set(Timings() if on else None)
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op while timing is off."""
+    timings = _current.get()
+    return _Stage(timings, name) if timings is not None else _NOOP
+
+
+def record(name, seconds, calls=1, worst=None):
+    timings = _current.get()
+    if timings is not None:
+        timings.record(name, seconds, calls, worst)
+
+
+def reset():
+    timings = _current.get()
+    if timings is not None:
+        with timings.lock:
+            timings.stats.clear()
+
+
+def collect():
+    """This context's stats since the last call, and clear them (how pool workers hand theirs back)."""
+    timings = _current.get()
+    if timings is None:
+        return {}
+    with timings.lock:
+        stats, timings.stats = timings.stats, {}
+    return stats
+
+
+def merge(stats):
+    """Add stats returned by :func:`collect` in another process."""
+    for name, (calls, total, worst) in stats.items():
+        record(name, total, calls, worst)
+
+
+def report():
+    """One row per stage, slowest total first, with times in milliseconds."""
+    timings = _current.get()
+    if timings is None:
+        return []
+    with timings.lock:
+        items = [(name, list(entry)) for name, entry in timings.stats.items()]
+    items.sort(key=lambda item: item[1][1], reverse=True)
+    return [{"stage": name, "calls": calls, "total_ms": round(total * 1e3, 2),
+             "mean_ms": round(total * 1e3 / calls, 3), "max_ms": round(worst * 1e3, 2)}
+            for name, (calls, total, worst) in items]
+
+
+def to_json(**meta):
+    """:func:`report` plus any ``meta`` (app, template, frames, ...) as a JSON document."""
+    return json.dumps({**meta, "stages": report()}, indent=2)
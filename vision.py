@@ -0,0 +1,110 @@
+"""Compact images for vision-model requests, and replies reused across near-identical photos.
+
+A vision request used to embed the full-resolution cut-out as a quality-90
+JPEG, several megabytes of base64, and the upload dominated the call. The
+model reads a few hundred pixels, so :func:`data_url` sends the product
+cropped to its alpha bounding box and bounded to ``ADGEN_VISION_MAX_SIDE``
+pixels, as a moderate-quality JPEG.
+
+:func:`cached_reply` keys a vision reply on a perceptual hash (:func:`phash`)
+of that thumbnail, so a re-upload, a re-encoded copy or a slightly
+different shot of the same product reuses the earlier reply without a
+network call. Replies live in a :class:`disk_cache.DiskCache`, one small
+JSON list per prompt, updated under a per-prompt lock.
+"""
+import base64
+import collections
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from disk_cache import CACHE_ROOT, DiskCache, digest
+
+MAX_SIDE = int(os.environ.get("ADGEN_VISION_MAX_SIDE", "512"))
+QUALITY = 80
+HASH_SIZE = 8        # phash bits = HASH_SIZE ** 2
+MAX_DISTANCE = 6     # Hamming distance (of 64 bits) up to which two photos count as the same product
+MAX_REPLIES = 256    # remembered photos per prompt
+
+REPLIES = DiskCache(os.path.join(CACHE_ROOT, "vision"), max_bytes=8 * 2**20, suffix=".json")
+
+_locks = collections.defaultdict(threading.Lock)   # one update of a prompt's reply list at a time
+_locks_guard = threading.Lock()
+
+
+def thumbnail(image, max_side=MAX_SIDE):
+    """RGB copy of ``image`` cropped to its opaque pixels and no larger than ``max_side``."""
+    if image.mode in ("RGBA", "LA", "PA"):
+        box = image.getchannel("A").getbbox()
+        if box:
+            image = image.crop(box)
+    image = image.convert("RGB")
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.BILINEAR, reducing_gap=2.0)
+    return image
+
+
+def data_url(image, quality=QUALITY):
+    """A ``data:image/jpeg;base64,...`` URL of :func:`thumbnail` (``image``), for the vision request."""
+    buf = io.BytesIO()
+    thumbnail(image).save(buf, format="JPEG", quality=quality, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+@functools.lru_cache(maxsize=4)
+def _dct_matrix(n):
+    k = np.arange(n)
+    return np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+
+
+def phash(image, size=HASH_SIZE):
+    """64-bit perceptual hash: signs of the lowest DCT frequencies of a 32x32 grey :func:`thumbnail`."""
+    n = size * 4
+    grey = np.asarray(thumbnail(image).convert("L").resize((n, n), Image.BILINEAR), np.float64)
+    d = _dct_matrix(n)
+    low = (d @ grey @ d.T)[:size, :size].ravel()
+    bits = low > np.median(low[1:])   # the DC term is left out of the median
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _entries(key):
+    try:
+        return json.loads(REPLIES.get(key) or b"[]")
+    except ValueError:
+        return []
+
+
+def cached_reply(image, prompt, ask, ttl=None, max_distance=MAX_DISTANCE):
+    """``ask()``'s reply for ``image`` under ``prompt``, reused from an earlier photo within ``max_distance``.
+
+    ``prompt`` is anything that identifies the request apart from the image
+    (model, text). Replies older than ``ttl`` seconds are not reused. A
+    falsy reply (a failed call) is returned but not remembered.
+    """
+    key = digest("vision", prompt)
+    h = phash(image)
+    now = time.time()
+    live = [e for e in _entries(key) if ttl is None or now - e["created"] < ttl]
+    best = min(live, key=lambda e: hamming(e["phash"], h), default=None)
+    if best is not None and hamming(best["phash"], h) <= max_distance:
+        return best["reply"]
+    reply = ask()
+    if reply:
+        with _locks_guard:
+            lock = _locks[key]
+        with lock:   # re-read: other sessions may have added replies while ask() ran
+            entries = _entries(key)
+            entries.append({"phash": h, "reply": reply, "created": now})
+            REPLIES.put(key, json.dumps(entries[-MAX_REPLIES:]).encode())
+    return reply